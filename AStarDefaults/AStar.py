@@ -1,11 +1,16 @@
 from AStarDefaults.SearchTree import  SearchTree
-from AStarDefaults.SearchTreeNode import SearchTreeNode
+from AStarDefaults.NodePool import PoolNode
+from heapq import heappop, heappush, heapify
+import itertools
+import time
 
 def make_path(goal):
     '''
     Creates a path by tracing parent pointers from the goal node to the start node
     It also returns path's length.
     '''
+    if isinstance(goal, PoolNode):
+        return goal.pool.make_path(goal.index), goal.g
     length = goal.g
     current = goal
     path = []
@@ -16,14 +21,46 @@ def make_path(goal):
     return path[::-1], length
 
 
-def AStar(space_map, heuristic_func=None, search_tree=SearchTree, max_steps=None):
+def generate_successors(space_map, state, dots=None):
+    '''
+    Returns successors of state as (states, move_costs, heuristics, goal_mask, dots).
+    If space_map supports batched methods, they are computed in one call each.
+
+    dots: cached joint coordinates of state, lets space_map compute dots of successors incrementally.
+          Returned dots are None if space_map doesn't support batched methods.
+    '''
+    if hasattr(space_map, 'get_successors_batch'):
+        states, move_costs, successors_dots = space_map.get_successors_batch(state, dots, return_dots=True)
+        return (states, move_costs, space_map.heuristic_batch(states), 
+                space_map.is_goal_batch(states), successors_dots)
+    successors = space_map.get_successors(state)
+    states = [successor_state for successor_state, _ in successors]
+    move_costs = [move_cost for _, move_cost in successors]
+    return (states, move_costs, 
+            [space_map.heuristic(successor_state) for successor_state in states],
+            [space_map.is_goal(successor_state) for successor_state in states],
+            [None] * len(states))
+
+
+def AStar(space_map, heuristic_func=None, search_tree=SearchTree, max_steps=None, incremental_fk=False,
+          weight=1., max_time=None):
+    '''
+    incremental_fk: if True joint coordinates are cached on nodes (SearchTreeNode.dots)
+                    and successors' coordinates are derived from them incrementally
+    weight: weighted A* with f = g + weight * h (found path is at most weight times longer
+            than optimal for admissible heuristic)
+    max_time: stop after max_time seconds of wall-clock time
+    '''
+
     ast = search_tree()
     steps = 0
     nodes_created = 0
     CLOSED = None
+    start_time = time.time()
     
     start_state = space_map.get_start()
-    start = SearchTreeNode(start_state, 0, space_map.heuristic(start_state))
+    start_h = space_map.heuristic(start_state)
+    start = ast.create_node(start_state, 0, start_h, weight * start_h)
     ast.add_to_open(start)
 
     current_state = start
@@ -31,25 +68,127 @@ def AStar(space_map, heuristic_func=None, search_tree=SearchTree, max_steps=None
         current_state = ast.get_best_node_from_open()
         if (current_state is None):
             break
-        for successor_state, move_cost in space_map.get_successors(current_state.state):
-            neighbour = SearchTreeNode(successor_state,
-                                       current_state.g + move_cost,
-                                       space_map.heuristic(successor_state),
-                                       parent=current_state)
-            if space_map.is_goal(neighbour.state):
+        parent_dots = current_state.dots if incremental_fk else None
+        successors = generate_successors(space_map, current_state.state, parent_dots)
+        for successor_state, move_cost, heuristic, is_goal, dots in zip(*successors):
+            neighbour = ast.create_node(successor_state,
+                                        current_state.g + move_cost,
+                                        heuristic,
+                                        current_state.g + move_cost + weight * heuristic,
+                                        parent=current_state)
+            if incremental_fk:
+                neighbour.dots = dots
+            if is_goal:
                 return True, neighbour, steps, nodes_created, ast.OPEN, ast.CLOSED
             nodes_created += 1
             if not ast.was_expanded(neighbour):
                 ast.add_to_open(neighbour) 
+            else:
+                ast.discard_node(neighbour)
         ast.add_to_closed(current_state)
         steps += 1
         if max_steps is not None and steps > max_steps:
             print("Stop by max_steps")
             break
+        if max_time is not None and time.time() - start_time > max_time:
+            print("Stop by max_time")
+            break
         if (steps + 1) % 50000 == 0:
             print(f"step = {steps + 1} g = {current_state.g} heuristic = {current_state.h} dist = {space_map.dist_to_finish(current_state.state)}")
  
     print("OPEN is empty")
     OPEN = ast.OPEN 
     CLOSED = ast.CLOSED
-    return False, current_state, steps, nodes_created, OPEN, CLOSED
\ No newline at end of file
+    return False, current_state, steps, nodes_created, OPEN, CLOSED
+
+
+def ARAStar(space_map, weights=(5., 3., 2., 1.5, 1.2, 1.), search_tree=SearchTree, max_steps=None, 
+            max_time=None, incremental_fk=False):
+    '''
+    Anytime repairing A* (ARA*). Runs weighted A* searches with decreasing weights
+    and reuses their work: OPEN is kept between searches (re-sorted by the new weight, 
+    f-values of OPEN are kept in the heap, not on nodes), 
+    states improved after their expansion are collected in INCONS and return to OPEN
+    for the next search, g-values and parents are kept for all states.
+    Every search expands states while their f = g + weight * h is less than cost of the best found solution.
+
+    weights: decreasing weights of searches
+    max_steps: stop after max_steps expansions in total
+    max_time: stop after max_time seconds of wall-clock time
+    yields: (goal, length, bound, steps) for every improved solution - goal node (use make_path),
+            its g-value, suboptimality bound (length / bound is a lower bound of optimal length
+            for admissible heuristic) and number of expansions so far
+    '''
+    ast = search_tree()
+    start_time = time.time()
+    counter = itertools.count()
+    start_state = space_map.get_start()
+    start = ast.create_node(start_state, 0, space_map.heuristic(start_state))
+    best = {start.key(): start}
+    queue = [(start.f, next(counter), start)]
+    incons = {}
+    goal, goal_g = None, float('inf')
+    if space_map.is_goal(start_state):
+        goal, goal_g = start, 0
+    last_yielded = (float('inf'), float('inf'))
+    steps = 0
+
+    def is_current(node):
+        return best.get(node.key()) is node
+
+    for weight in weights:
+        # OPEN of the new search is OPEN and INCONS of the previous one with new f-values
+        nodes = {node.key(): node for _, _, node in queue if is_current(node)}
+        nodes.update(incons)
+        queue = [(node.g + weight * node.h, next(counter), node) for node in nodes.values()]
+        heapify(queue)
+        incons = {}
+        closed = set()
+
+        stopped = False
+        while queue and queue[0][0] < goal_g:
+            if (max_steps is not None and steps >= max_steps) or \
+               (max_time is not None and time.time() - start_time > max_time):
+                stopped = True
+                break
+            _, _, current = heappop(queue)
+            key = current.key()
+            if key in closed or not is_current(current):
+                continue
+            closed.add(key)
+            parent_dots = current.dots if incremental_fk else None
+            for successor_state, move_cost, heuristic, successor_is_goal, dots in \
+                    zip(*generate_successors(space_map, current.state, parent_dots)):
+                g = current.g + move_cost
+                neighbour = ast.create_node(successor_state, g, heuristic, g + weight * heuristic, parent=current)
+                neighbour_key = neighbour.key()
+                known = best.get(neighbour_key)
+                if known is not None and known.g <= g:
+                    ast.discard_node(neighbour)
+                    continue
+                if incremental_fk:
+                    neighbour.dots = dots
+                best[neighbour_key] = neighbour
+                if successor_is_goal and g < goal_g:
+                    goal, goal_g = neighbour, g
+                if neighbour_key in closed:
+                    incons[neighbour_key] = neighbour
+                else:
+                    heappush(queue, (g + weight * heuristic, next(counter), neighbour))
+            steps += 1
+
+        if goal is not None:
+            # lower bound of optimal length is the minimum of g + h over OPEN and INCONS
+            lower_bounds = [node.g + node.h for _, _, node in queue 
+                            if is_current(node) and node.key() not in closed]
+            lower_bounds += [node.g + node.h for node in incons.values()]
+            lower_bound = min(lower_bounds, default=goal_g)
+            bound = goal_g / lower_bound if lower_bound > 0 else float('inf')
+            if not stopped:
+                bound = min(bound, weight)
+            bound = max(bound, 1.)
+            if (goal_g, bound) != last_yielded and (goal_g < last_yielded[0] or bound < last_yielded[1]):
+                last_yielded = (goal_g, bound)
+                yield goal, goal_g, bound, steps
+        if stopped or not queue and not incons:
+            break
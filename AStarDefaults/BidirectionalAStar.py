@@ -0,0 +1,143 @@
+from heapq import heappop, heappush
+import itertools
+import time
+import numpy as np
+from Manipulator2DMap.Manipulator2D import TWO_PI
+
+
+def move_cost_weights(num_joints):
+    '''
+    Costs of moves of GridMap2D per radian: move of joint j by deltas costs deltas * (j + 1)
+    '''
+    return np.arange(1, num_joints + 1, dtype=float)
+
+
+def weighted_distances(states, targets, joint_weights):
+    '''
+    Weighted wrap-aware angle distances sum_j joint_weights[j] * |target_j - state_j|
+    from every state to every target.
+
+    states: np.ndarray(N, num_joints), targets: np.ndarray(G, num_joints)
+    return: np.ndarray(N, G)
+    '''
+    diffs = np.abs(states[:, np.newaxis] - targets[np.newaxis]) % TWO_PI
+    diffs = np.minimum(diffs, TWO_PI - diffs)
+    return diffs @ joint_weights
+
+
+def joint_distances(states, targets, joint_weights):
+    '''
+    Minimum over targets of weighted_distances.
+    With move_cost_weights it is a consistent heuristic for moves of GridMap2D.
+
+    states: np.ndarray(N, num_joints), targets: np.ndarray(G, num_joints)
+    return: np.ndarray(N,)
+    '''
+    return weighted_distances(states, targets, joint_weights).min(-1)
+
+
+def lattice_goal_states(space_map, num_states=32):
+    '''
+    Goal configurations of space_map (inverse kinematics solutions from goal_states and inverse_angles)
+    snapped to lattice: all 2 ** num_joints corners of the lattice cell around every solution are tried
+    and only correct ones, which satisfy is_goal, are kept.
+    '''
+    lattice = space_map._lattice
+    states = np.concatenate([space_map.goal_states(num_states), np.reshape(space_map.inverse_angles, (1, -1))])
+    low_bins = np.floor((states - lattice.offsets) / lattice.deltas).astype(np.int64)
+    corners = np.array(list(itertools.product([0, 1], repeat=lattice.num_joints)), dtype=np.int64)
+    bins = (low_bins[:, np.newaxis] + corners).reshape(-1, lattice.num_joints) % lattice.size
+    states = lattice.keys_to_angles(np.unique(lattice.pack(bins)))
+    return states[space_map.is_goal_batch(states) & space_map.check_states_batch(states)]
+
+
+def BidirectionalAStar(space_map, goal_states=None, max_steps=None, max_time=None, num_goal_states=32):
+    '''
+    Bidirectional A* over lattice states of space_map (GridMap2D).
+    Forward search starts from the start state, backward one from all goal configurations
+    (lattice_goal_states by default). Moves are symmetric, so both searches use get_successors_batch.
+    Heuristics are joint_distances to goal configurations and to the start.
+    Both searches share one visited map: packed lattice key -> [g forward, g backward,
+    parent forward, parent backward, state]. Every time a state gets g-values from both sides,
+    the best meeting cost mu is updated. Search stops when mu <= max(min f forward, min f backward),
+    so the found path is optimal on the lattice (successors with f >= mu are not queued at all).
+    The side with larger minimum f is expanded first.
+
+    goal_states: np.ndarray(G, num_joints) of goal configurations on lattice
+    max_steps: stop after max_steps expansions in total
+    max_time: stop after max_time seconds of wall-clock time
+    return: (found, path, length, steps, nodes_created)
+    '''
+    start_time = time.time()
+    lattice = space_map._lattice
+    manipulator = space_map._manipulator
+    joint_weights = move_cost_weights(manipulator.num_joints)
+    start_state = np.asarray(space_map.get_start(), dtype=float)
+    if goal_states is None:
+        goal_states = lattice_goal_states(space_map, num_goal_states)
+    if len(goal_states) == 0:
+        return False, None, None, 0, 0
+    targets = [goal_states, start_state[np.newaxis]]
+    counter = itertools.count()
+
+    visited = {}
+    queues = [[], []]
+    closed = [set(), set()]
+    start_key = int(lattice.angles_to_keys(start_state))
+    visited[start_key] = [0., np.inf, None, None, start_state]
+    heappush(queues[0], (joint_distances(start_state[np.newaxis], goal_states, joint_weights)[0], next(counter), start_key))
+    for key, state, h in zip(lattice.angles_to_keys(goal_states), goal_states, 
+                             joint_distances(goal_states, targets[1], joint_weights)):
+        record = visited.setdefault(int(key), [np.inf, np.inf, None, None, state])
+        record[1] = 0.
+        heappush(queues[1], (h, next(counter), int(key)))
+
+    best_cost, meeting = np.inf, None
+    if np.isfinite(visited[start_key][1]):
+        best_cost, meeting = 0., start_key
+    steps, nodes_created = 0, 0
+    while queues[0] and queues[1]:
+        if best_cost <= max(queues[0][0][0], queues[1][0][0]):
+            break
+        if (max_steps is not None and steps >= max_steps) or \
+           (max_time is not None and time.time() - start_time > max_time):
+            break
+        # raising the larger of minimum f-values brings the stop condition closer
+        side = 0 if queues[0][0][0] >= queues[1][0][0] else 1
+        _, _, key = heappop(queues[side])
+        if key in closed[side]:
+            continue
+        closed[side].add(key)
+        steps += 1
+        g, state = visited[key][side], visited[key][4]
+        states, move_costs = space_map.get_successors_batch(state)
+        if not len(states):
+            continue
+        successor_keys = lattice.angles_to_keys(states)
+        successor_gs = g + move_costs
+        heuristics = joint_distances(states, targets[side], joint_weights)
+        for successor_key, successor_state, successor_g, h in \
+                zip(successor_keys.tolist(), states, successor_gs, heuristics):
+            record = visited.get(successor_key)
+            if record is None:
+                record = visited[successor_key] = [np.inf, np.inf, None, None, successor_state]
+                nodes_created += 1
+            if successor_g >= record[side] or successor_g + h >= best_cost:
+                continue
+            record[side] = successor_g
+            record[side + 2] = key
+            heappush(queues[side], (successor_g + h, next(counter), successor_key))
+            if successor_g + record[1 - side] < best_cost:
+                best_cost, meeting = successor_g + record[1 - side], successor_key
+
+    if meeting is None:
+        return False, None, None, steps, nodes_created
+    forward, backward = [meeting], []
+    while visited[forward[-1]][2] is not None:
+        forward.append(visited[forward[-1]][2])
+    key = visited[meeting][3]
+    while key is not None:
+        backward.append(key)
+        key = visited[key][3]
+    path = [visited[key][4] for key in forward[::-1] + backward]
+    return True, path, best_cost, steps, nodes_created
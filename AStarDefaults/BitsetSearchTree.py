@@ -0,0 +1,140 @@
+import numpy as np
+from AStarDefaults.SearchTree import SearchTree
+from AStarDefaults.SearchTreeNode import SearchTreeNode
+
+
+class DenseBitset:
+
+    def __init__(self, num_cells):
+        '''
+        Set of integer keys in [0, num_cells) stored as one bit per key.
+        Memory is num_cells / 8 bytes (np.zeros, so untouched pages are not committed by OS).
+        '''
+        self.num_cells = num_cells
+        self._bits = np.zeros((num_cells + 7) // 8, dtype=np.uint8)
+        self._view = memoryview(self._bits)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return (self._view[key >> 3] >> (key & 7)) & 1 == 1
+
+    def add(self, key):
+        byte, mask = key >> 3, 1 << (key & 7)
+        value = self._view[byte]
+        if not value & mask:
+            self._view[byte] = value | mask
+            self._size += 1
+
+    def contains_batch(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return (self._bits[keys >> 3] >> (keys & 7).astype(np.uint8)) & 1 == 1
+
+    def add_batch(self, keys):
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        keys = keys[~self.contains_batch(keys)]
+        np.bitwise_or.at(self._bits, keys >> 3, (1 << (keys & 7)).astype(np.uint8))
+        self._size += len(keys)
+
+    def keys(self):
+        '''
+        Sorted np.ndarray of all stored keys, only non-zero bytes are unpacked
+        '''
+        nonzero = np.flatnonzero(self._bits)
+        rows, bits = np.nonzero(np.unpackbits(self._bits[nonzero, np.newaxis], axis=1, bitorder='little'))
+        return nonzero[rows] * 8 + bits
+
+    @property
+    def nbytes(self):
+        return self._bits.nbytes
+
+
+class ChunkedBitset:
+
+    def __init__(self, chunk_bits=16):
+        '''
+        Sparse set of non-negative integer keys: bitmap is split into chunks of 2 ** chunk_bits keys,
+        and only chunks with at least one key are allocated (dict chunk index -> DenseBitset).
+        Search visits a local region of lattice, so a few chunks cover it.
+        '''
+        self.chunk_bits = chunk_bits
+        self._mask = (1 << chunk_bits) - 1
+        self._chunks = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        chunk = self._chunks.get(key >> self.chunk_bits)
+        return chunk is not None and (key & self._mask) in chunk
+
+    def add(self, key):
+        chunk = self._chunks.get(key >> self.chunk_bits)
+        if chunk is None:
+            chunk = self._chunks[key >> self.chunk_bits] = DenseBitset(1 << self.chunk_bits)
+        size = len(chunk)
+        chunk.add(key & self._mask)
+        self._size += len(chunk) - size
+
+    def contains_batch(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return np.array([int(key) in self for key in keys.ravel()], dtype=bool).reshape(keys.shape)
+
+    def add_batch(self, keys):
+        for key in np.asarray(keys, dtype=np.int64).ravel().tolist():
+            self.add(key)
+
+    def keys(self):
+        keys = [chunk.keys() + (index << self.chunk_bits) for index, chunk in sorted(self._chunks.items())]
+        return np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+
+class BitsetSearchTree(SearchTree):
+
+    def __init__(self, lattice, sparse=None, max_dense_bytes=1 << 28, chunk_bits=16):
+        '''
+        SearchTree with CLOSED stored as a bitset over packed lattice keys (see Lattice):
+        O(1) membership and predictable memory instead of a set of nodes.
+        States of nodes may be packed keys (LatticeMap) or lattice angles (GridMap2D).
+        Use as AStar(space_map, search_tree=partial(BitsetSearchTree, lattice)).
+        Expanded nodes are not kept, so CLOSED returns new SearchTreeNodes with states only
+        (packed keys or angles, like states of added nodes), their g-values and parents are lost.
+
+        lattice: Lattice of the searched manipulator
+        sparse: if True CLOSED is a ChunkedBitset, if False it is a DenseBitset over the whole lattice,
+                by default dense is used if it takes at most max_dense_bytes
+        chunk_bits: log2 of number of keys in one chunk of ChunkedBitset
+        '''
+        super().__init__()
+        self.lattice = lattice
+        if sparse is None:
+            sparse = lattice.num_cells > 8 * max_dense_bytes
+        self._closed = ChunkedBitset(chunk_bits) if sparse else DenseBitset(lattice.num_cells)
+        self._key_states = False
+
+    def lattice_key(self, item):
+        state = item.state
+        if np.ndim(state) == 0:
+            return int(state)
+        return int(self.lattice.angles_to_keys(state))
+
+    def add_to_closed(self, item):
+        self._key_states = np.ndim(item.state) == 0
+        self._closed.add(self.lattice_key(item))
+
+    def was_expanded(self, item):
+        return self.lattice_key(item) in self._closed
+
+    @property
+    def CLOSED(self):
+        keys = self._closed.keys()
+        if self._key_states:
+            return [SearchTreeNode(int(key)) for key in keys]
+        return [SearchTreeNode(state) for state in self.lattice.keys_to_angles(keys)]
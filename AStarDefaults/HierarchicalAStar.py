@@ -0,0 +1,154 @@
+import time
+import numpy as np
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, TWO_PI
+from Manipulator2DMap.obstacle import SphereObstacle
+from Manipulator2DMap.Map import GridMap2D
+from Manipulator2DMap.edge_checker import angle_differences
+from AStarDefaults.AStar import AStar, make_path
+from AStarDefaults.BidirectionalAStar import move_cost_weights, weighted_distances
+
+
+class CorridorMap:
+
+    def __init__(self, space_map, path, width):
+        '''
+        View of space_map (GridMap2D), where only states inside the corridor around path are kept:
+        state is inside if for one of path states all joints differ by at most width (wrap-aware).
+        Heuristic follows the path: remaining path length from the nearest path state
+        (by weighted joint distance) plus distance to it. Move costs of GridMap2D are in radians,
+        so lengths of paths of different discretizations are comparable. Taking the nearest state
+        instead of minimum over all of them keeps search from shortcuts to the end of a path,
+        which returns close to its beginning.
+        All other methods are taken from space_map.
+
+        path: np.ndarray(P, num_joints) of states of a coarser path
+        width: half-width of the corridor in radians
+        '''
+        self._space_map = space_map
+        self.path = np.asarray(path, dtype=float)
+        self.width = width
+        self._joint_weights = move_cost_weights(self.path.shape[1])
+        lengths = np.abs(angle_differences(self.path[:-1], self.path[1:])) @ self._joint_weights
+        self._cost_to_go = np.concatenate([np.cumsum(lengths[::-1])[::-1], [0.]])
+
+    def __getattr__(self, name):
+        return getattr(self._space_map, name)
+
+    def in_corridor_batch(self, states):
+        diffs = angle_differences(self.path[np.newaxis], np.asarray(states)[:, np.newaxis])
+        return (np.abs(diffs).max(-1) <= self.width).any(-1)
+
+    def heuristic_batch(self, states):
+        states = np.atleast_2d(states)
+        distances = weighted_distances(states, self.path, self._joint_weights)
+        nearest = distances.argmin(-1)
+        return distances[np.arange(len(states)), nearest] + self._cost_to_go[nearest]
+
+    def heuristic(self, angles):
+        return self.heuristic_batch(angles)[0]
+
+    def get_successors_batch(self, angles, dots=None, return_dots=False):
+        states, move_costs, successors_dots = self._space_map.get_successors_batch(angles, dots, return_dots=True)
+        inside = self.in_corridor_batch(states)
+        if return_dots:
+            return states[inside], move_costs[inside], successors_dots[inside]
+        return states[inside], move_costs[inside]
+
+    def get_successors(self, angles):
+        return list(zip(*self.get_successors_batch(angles)))
+
+
+def extend_to_goal(space_map, path, step):
+    '''
+    Coarse goal tolerance is larger than the fine one, so path is extended by a straight
+    joint-space segment (states not farther than step) to the nearest goal configuration
+    of space_map (goal_states), if there is one.
+    '''
+    path = np.asarray(path, dtype=float)
+    goal_states = space_map.goal_states()
+    if len(goal_states) == 0:
+        return path
+    goal = goal_states[np.argmin(weighted_distances(goal_states, path[-1:], move_cost_weights(path.shape[1])))]
+    diff = angle_differences(path[-1], goal)
+    num_steps = int(np.ceil(np.abs(diff).max() / step))
+    if num_steps == 0:
+        return path
+    t = np.arange(1, num_steps + 1)[:, np.newaxis] / num_steps
+    return np.concatenate([path, path[-1] + t * diff])
+
+
+def coarse_map(space_map, angle_discretization, margin):
+    '''
+    Copy of space_map (GridMap2D) for a manipulator with angle_discretization bins.
+    Sphere obstacles are inflated by margin, so coarse moves keep away from them,
+    goal tolerance is scaled by ratio of discretizations.
+    '''
+    manipulator = space_map._manipulator
+    coarse_manipulator = Manipulator_2d_supervisor(manipulator.num_joints, manipulator.lengths, angle_discretization,
+                                                   manipulator.angles_constraints, manipulator.ground_level,
+                                                   manipulator.distanse_between_edges)
+    obstacles = [SphereObstacle(obs.center, obs.r + margin) if isinstance(obs, SphereObstacle) else obs
+                 for obs in space_map._obstacles]
+    level_map = GridMap2D(coarse_manipulator, space_map.get_start(), (space_map._goal_position, space_map._goal_angle),
+                          heuristic=space_map._heuristic_function, obstacles=obstacles,
+                          continuous_edges=space_map._continuous_edges)
+    # start may be inside inflated obstacles, search leaves it through free successors
+    level_map.set_start(space_map.get_start())
+    level_map.eps = space_map.eps * manipulator.angle_discretization / angle_discretization
+    return level_map
+
+
+def HierarchicalAStar(space_map, levels=(36,), margin=0.5, width=None, max_widenings=2, fallback=True,
+                      weight=3., max_steps=None, max_time=None, search=AStar):
+    '''
+    Coarse-to-fine planning. The problem is solved on coarse lattices first (angle_discretization
+    from levels, from the coarsest one) with obstacles inflated by margin, then every next level
+    (the last one is space_map itself) is searched only inside CorridorMap around the previous path.
+    Previous path is extended to the nearest goal configuration of the level (extend_to_goal).
+    If search in corridor fails, corridor is widened twice up to max_widenings times,
+    then (if fallback) the level is searched without corridor.
+    If a coarse level fails, the next level is searched without corridor.
+
+    levels: angle discretizations of coarse levels, coarser than space_map's one
+    width: half-width of corridor, 2 bins of the previous level by default
+    weight: weight of heuristic in searches of all levels
+    max_steps: max_steps of every single search
+    max_time: wall-clock limit of the whole planning
+    search: search function with AStar interface (max_steps, max_time and weight arguments)
+    return: (found, path, length, stats) - path and length like in make_path,
+            stats['levels'] is a list of dicts with angle_discretization, found, steps, width and time of every level
+    '''
+    start_time = time.time()
+    maps = [coarse_map(space_map, bins, margin) for bins in levels] + [space_map]
+    stats = {'levels': []}
+    path, found, length = None, False, None
+    for level_map in maps:
+        level_start = time.time()
+        bins = level_map._manipulator.angle_discretization
+        widths = [None]
+        if path is not None:
+            level_width = width if width is not None else 2 * TWO_PI / previous_bins
+            widths = [level_width * 2 ** i for i in range(max_widenings + 1)] + ([None] if fallback else [])
+            path = extend_to_goal(level_map, path, level_width / 2)
+        steps = 0
+        for corridor_width in widths:
+            remaining = None if max_time is None else max(max_time - (time.time() - start_time), 0)
+            searched_map = level_map if corridor_width is None else CorridorMap(level_map, path, corridor_width)
+            found, goal, level_steps = search(searched_map, max_steps=max_steps, max_time=remaining,
+                                               weight=weight)[:3]
+            steps += level_steps
+            if found or (max_time is not None and time.time() - start_time > max_time):
+                break
+        stats['levels'].append({'angle_discretization': bins, 'found': found, 'steps': steps,
+                                'width': corridor_width, 'time': time.time() - level_start})
+        if found:
+            path, length = make_path(goal)
+        elif level_map is not space_map:
+            path = None
+        previous_bins = bins
+        if max_time is not None and time.time() - start_time > max_time:
+            break
+    stats['time'] = time.time() - start_time
+    if not found or level_map is not space_map:
+        return False, None, None, stats
+    return True, path, length, stats
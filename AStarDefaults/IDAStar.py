@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import time
+import numpy as np
+from Manipulator2DMap.lattice import Lattice
+from AStarDefaults.AStar import generate_successors
+from AStarDefaults.SearchTreeNode import SearchTreeNode
+
+
+class TranspositionTable:
+
+    def __init__(self, max_size=1000000):
+        '''
+        Bounded LRU map of state key -> (iteration, g), used by IDAStar to prune
+        states, which were already reached in the current iteration with smaller or equal g.
+        When full, the least recently used entry is forgotten, so memory is bounded
+        and search only repeats some work instead of failing.
+        '''
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def dominated(self, key, iteration, g):
+        '''
+        True if key was reached in this iteration with g-value not worse than g, otherwise stores g
+        '''
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == iteration and entry[1] <= g:
+            self._entries.move_to_end(key)
+            return True
+        self._entries[key] = (iteration, g)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return False
+
+
+def transposition_keys(space_map):
+    '''
+    Returns function np.ndarray of states -> list of keys for TranspositionTable.
+    Angles are packed to int64 lattice keys (see Lattice), so states reached by different paths
+    are equal keys regardless of float drift. Packed keys of LatticeMap are used as they are,
+    states are keyed by tuples only if keys don't fit int64 or space_map has no manipulator.
+    '''
+    manipulator = getattr(space_map, '_manipulator', None)
+    lattice = None if manipulator is None else Lattice(manipulator)
+
+    def keys(states):
+        states = np.asarray(states)
+        if states.ndim == 1 and np.issubdtype(states.dtype, np.integer):
+            return states.tolist()
+        if lattice is not None and lattice.packable:
+            on_lattice = lattice.on_lattice(states)
+            if on_lattice.all():
+                return lattice.angles_to_keys(states).tolist()
+        return [tuple(state) for state in states]
+
+    return keys
+
+
+def IDAStar(space_map, max_nodes=1000000, max_steps=None, max_time=None):
+    '''
+    Iterative deepening A* with a bounded transposition table.
+    Every iteration is a depth-first search, which cuts nodes with f = g + h above threshold,
+    the next threshold is the minimum cut f. Memory is O(depth * branching) for the DFS stack
+    plus at most max_nodes entries of TranspositionTable, states are keyed by transposition_keys.
+    Uses only space_map interface of AStar (get_start, get_successors(_batch), heuristic(_batch), is_goal(_batch)).
+
+    max_nodes: size of transposition table
+    max_steps: stop after max_steps expansions in total
+    max_time: stop after max_time seconds of wall-clock time
+    return: (found, node, steps, nodes_created, stats) - node is the goal SearchTreeNode (use make_path)
+            or the last expanded node, stats has number of iterations, final threshold and table evictions
+    '''
+    start_time = time.time()
+    table = TranspositionTable(max_nodes)
+    start_state = space_map.get_start()
+    start = SearchTreeNode(start_state, 0, space_map.heuristic(start_state))
+    threshold = start.f
+    steps, nodes_created, iteration = 0, 0, 0
+    node = start
+    stats = {'iterations': 0, 'threshold': threshold, 'evictions': 0}
+
+    keys = transposition_keys(space_map)
+    start_key = keys(np.array([start_state]))[0]
+
+    def children(node):
+        states, move_costs, heuristics, goals, _ = generate_successors(space_map, node.state)
+        items = [SearchTreeNode(state, node.g + move_cost, heuristic, parent=node)
+                 for state, move_cost, heuristic in zip(states, move_costs, heuristics)]
+        items_keys = keys(states) if len(items) else []
+        # the most promising successors are searched first (stack pops from the end)
+        order = np.argsort([-item.f for item in items], kind='stable')
+        return [items[i] for i in order], [goals[i] for i in order], [items_keys[i] for i in order]
+
+    while np.isfinite(threshold):
+        iteration += 1
+        next_threshold = np.inf
+        table.dominated(start_key, iteration, 0)
+        on_path = {start_key}
+        stack = [(start, start_key, *children(start))]
+        steps += 1
+        while stack:
+            if (max_steps is not None and steps >= max_steps) or \
+               (max_time is not None and time.time() - start_time > max_time):
+                stats.update(iterations=iteration, threshold=threshold, evictions=table.evictions)
+                return False, node, steps, nodes_created, stats
+            parent, parent_key, items, goals, items_keys = stack[-1]
+            if not items:
+                stack.pop()
+                on_path.discard(parent_key)
+                continue
+            node, is_goal, key = items.pop(), goals.pop(), items_keys.pop()
+            nodes_created += 1
+            if node.f > threshold:
+                next_threshold = min(next_threshold, node.f)
+                continue
+            if is_goal:
+                stats.update(iterations=iteration, threshold=threshold, evictions=table.evictions)
+                return True, node, steps, nodes_created, stats
+            if key in on_path or table.dominated(key, iteration, node.g):
+                continue
+            on_path.add(key)
+            stack.append((node, key, *children(node)))
+            steps += 1
+        threshold = next_threshold
+
+    stats.update(iterations=iteration, threshold=threshold, evictions=table.evictions)
+    return False, node, steps, nodes_created, stats
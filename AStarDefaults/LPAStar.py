@@ -0,0 +1,212 @@
+from heapq import heappop, heappush
+import itertools
+import time
+import numpy as np
+from AStarDefaults.BidirectionalAStar import joint_distances, lattice_goal_states, move_cost_weights
+
+
+class LPAStar:
+
+    GOAL = -1
+
+    def __init__(self, space_map, goal_states=None, num_goal_states=32):
+        '''
+        Lifelong planning A* (LPA*) over lattice states of space_map (GridMap2D), which keeps
+        g and rhs values between calls, so after a change of obstacles only affected states are repaired.
+        Goal configurations (lattice_goal_states by default) are connected to a virtual GOAL node with zero cost.
+        Validity of every met state is stored, after obstacle events it is rechecked in one batch
+        only for states, which may have changed (see add_obstacle, remove_obstacle, move_obstacle).
+        Heuristic is joint_distances to goal configurations (consistent with lattice moves).
+
+        goal_states: np.ndarray(G, num_joints) of goal configurations on lattice,
+                     ValueError is raised if there are none
+        '''
+        self.space_map = space_map
+        self.lattice = space_map._lattice
+        manipulator = space_map._manipulator
+        self.move_cost = manipulator.move_cost
+        self.joint_weights = move_cost_weights(manipulator.num_joints)
+        if goal_states is None:
+            goal_states = lattice_goal_states(space_map, num_goal_states)
+        self.goal_states = np.asarray(goal_states, dtype=float).reshape(-1, manipulator.num_joints)
+        if len(self.goal_states) == 0:
+            raise ValueError("no correct goal configuration on lattice (see lattice_goal_states)")
+        self.goal_keys = set(self.lattice.angles_to_keys(self.goal_states).tolist())
+        self.start = int(self.lattice.angles_to_keys(space_map.get_start()))
+
+        self.g = {}
+        self.rhs = {self.start: 0.}
+        self.valid = {}
+        self._h = {self.GOAL: 0.}
+        self._queue = []
+        self._queued = {}
+        self._counter = itertools.count()
+        self._check([self.start])
+        self._push(self.start)
+        self.expansions = 0
+
+    def _check(self, keys):
+        '''
+        Checks validity of states keys, which weren't checked yet
+        '''
+        keys = [key for key in keys if key not in self.valid]
+        if keys:
+            states = self.lattice.keys_to_angles(np.array(keys, dtype=np.int64))
+            self.valid.update(zip(keys, self.space_map.check_states_batch(states).tolist()))
+            self._h.update(zip(keys, joint_distances(states, self.goal_states, self.joint_weights).tolist()))
+
+    def predecessors(self, key):
+        '''
+        Returns (keys, costs) of states, which have moves to key: lattice neighbours of key 
+        (moves are symmetric) or goal states for GOAL. Cost is inf if one of states is invalid.
+        '''
+        if key == self.GOAL:
+            keys = list(self.goal_keys)
+            self._check(keys)
+            return keys, [0. if self.valid[goal] else np.inf for goal in keys]
+        keys = self.lattice.pack(self.lattice.neighbours(key)).tolist()
+        self._check(keys)
+        if not self.valid[key]:
+            return keys, [np.inf] * len(keys)
+        return keys, [cost if self.valid[neighbour] else np.inf for neighbour, cost in zip(keys, self.move_cost)]
+
+    def successors(self, key):
+        '''
+        Returns (keys, costs) of states, which key has moves to: lattice neighbours and GOAL for goal states
+        '''
+        if key == self.GOAL:
+            return [], []
+        keys, costs = self.predecessors(key)
+        if key in self.goal_keys:
+            keys.append(self.GOAL)
+            costs.append(0. if self.valid[key] else np.inf)
+        return keys, costs
+
+    def key(self, state):
+        g = min(self.g.get(state, np.inf), self.rhs.get(state, np.inf))
+        # keys are rounded, so states on an optimal path tie with GOAL exactly and are expanded
+        return (round(g + self._h[state], 9), round(g, 9))
+
+    def _push(self, state):
+        key = self.key(state)
+        self._queued[state] = key
+        heappush(self._queue, (key, next(self._counter), state))
+
+    def _top(self):
+        while self._queue:
+            key, _, state = self._queue[0]
+            if self._queued.get(state) == key:
+                return key, state
+            heappop(self._queue)
+        return (np.inf, np.inf), None
+
+    def update_state(self, state):
+        if state != self.start:
+            keys, costs = self.predecessors(state)
+            self.rhs[state] = min((self.g.get(neighbour, np.inf) + cost for neighbour, cost in zip(keys, costs)),
+                                  default=np.inf)
+        self._queued.pop(state, None)
+        if self.g.get(state, np.inf) != self.rhs.get(state, np.inf):
+            self._push(state)
+
+    def compute_shortest_path(self, max_steps=None, max_time=None):
+        '''
+        Expands inconsistent states until GOAL is consistent and all queued states have larger keys.
+        return: (found, path, length, steps) - path is a list of lattice states
+        '''
+        start_time = time.time()
+        steps = 0
+        while True:
+            top_key, state = self._top()
+            if state is None or (top_key > self.key(self.GOAL) and
+                                 self.rhs.get(self.GOAL, np.inf) == self.g.get(self.GOAL, np.inf)):
+                break
+            if (max_steps is not None and steps >= max_steps) or \
+               (max_time is not None and time.time() - start_time > max_time):
+                # search is interrupted, g-values are not final yet
+                self.expansions += steps
+                return False, None, None, steps
+            heappop(self._queue)
+            del self._queued[state]
+            steps += 1
+            keys, costs = self.successors(state)
+            if self.g.get(state, np.inf) > self.rhs[state]:
+                self.g[state] = self.rhs[state]
+                for neighbour, cost in zip(keys, costs):
+                    if neighbour != self.start and self.g[state] + cost < self.rhs.get(neighbour, np.inf):
+                        self.rhs[neighbour] = self.g[state] + cost
+                        self._queued.pop(neighbour, None)
+                        if self.g.get(neighbour, np.inf) != self.rhs[neighbour]:
+                            self._push(neighbour)
+            else:
+                self.g[state] = np.inf
+                self.update_state(state)
+                for neighbour in keys:
+                    self.update_state(neighbour)
+        self.expansions += steps
+        length = self.g.get(self.GOAL, np.inf)
+        if not np.isfinite(length):
+            return False, None, None, steps
+        return True, self.path(), length, steps
+
+    def path(self):
+        '''
+        Traces the shortest path from GOAL back to start by the best predecessors
+        '''
+        keys, state = [], self.GOAL
+        while state != self.start:
+            neighbours, costs = self.predecessors(state)
+            state = min(zip(neighbours, costs), key=lambda item: self.g.get(item[0], np.inf) + item[1])[0]
+            keys.append(state)
+        return list(self.lattice.keys_to_angles(np.array(keys[::-1], dtype=np.int64)))
+
+    def _recheck(self, keys, checker):
+        '''
+        Rechecks stored states keys in one batch with checker(states) -> bool np.ndarray
+        and updates states, which validity changed, and their neighbours
+        '''
+        if not keys:
+            return []
+        states = self.lattice.keys_to_angles(np.array(keys, dtype=np.int64))
+        changed = [key for key, valid in zip(keys, checker(states).tolist()) if valid != self.valid[key]]
+        for key in changed:
+            self.valid[key] = not self.valid[key]
+        for key in changed:
+            self.update_state(key)
+            for neighbour in self.successors(key)[0]:
+                self.update_state(neighbour)
+        return changed
+
+    def add_obstacle(self, obstacle):
+        '''
+        Adds obstacle to space_map. Only valid stored states can become invalid,
+        they are checked against the new obstacle alone.
+        return: list of keys of changed states
+        '''
+        self.space_map.add_obstacle(obstacle)
+        manipulator = self.space_map._manipulator
+        return self._recheck([key for key, valid in self.valid.items() if valid],
+                             lambda states: ~obstacle.intersect_batch(states, manipulator))
+
+    def remove_obstacle(self, obstacle):
+        '''
+        Removes obstacle from space_map. Only invalid stored states can become valid.
+        '''
+        self.space_map.remove_obstacle(obstacle)
+        return self._recheck([key for key, valid in self.valid.items() if not valid],
+                             self.space_map.check_states_batch)
+
+    def move_obstacle(self, obstacle, center):
+        '''
+        Moves obstacle of space_map to center. Valid states are checked against the moved obstacle,
+        invalid states, which intersected it before the move, are checked fully.
+        '''
+        manipulator = self.space_map._manipulator
+        invalid = [key for key, valid in self.valid.items() if not valid]
+        if invalid:
+            states = self.lattice.keys_to_angles(np.array(invalid, dtype=np.int64))
+            invalid = [key for key, hit in zip(invalid, obstacle.intersect_batch(states, manipulator).tolist()) if hit]
+        self.space_map.move_obstacle(obstacle, center)
+        changed = self._recheck([key for key, valid in self.valid.items() if valid],
+                                lambda states: ~obstacle.intersect_batch(states, manipulator))
+        return changed + self._recheck(invalid, self.space_map.check_states_batch)
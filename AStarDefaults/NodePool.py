@@ -0,0 +1,193 @@
+from heapq import heappop, heappush
+import numpy as np
+from AStarDefaults.SearchTree import SearchTree
+
+
+class NodePool:
+
+    def __init__(self, capacity=1024):
+        '''
+        Array-backed storage of search nodes.
+        States, g, h, f and parent indices are kept in preallocated NumPy arrays,
+        which are doubled when full. Parent index -1 means no parent.
+        Joint coordinates of states (for incremental_fk of AStar) are stored in self.dots,
+        which is allocated on the first set_dots, NaN marks nodes without dots.
+
+        capacity: initial number of nodes
+        '''
+        self._capacity = capacity
+        self._size = 0
+        self.states = None
+        self.g = np.empty(capacity)
+        self.h = np.empty(capacity)
+        self.f = np.empty(capacity)
+        self.parents = np.empty(capacity, dtype=np.int64)
+        self.dots = None
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        self._capacity *= 2
+        for name in ('states', 'g', 'h', 'f', 'parents', 'dots'):
+            old = getattr(self, name)
+            if old is None:
+                continue
+            new = np.full((self._capacity,) + old.shape[1:], np.nan) if name == 'dots' else \
+                  np.empty((self._capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, state, g=0, h=0, f=None, parent=-1):
+        '''
+        Stores node and returns its index
+        '''
+        if self.states is None:
+            state = np.asarray(state)
+            self.states = np.empty((self._capacity,) + state.shape, dtype=state.dtype)
+        if self._size == self._capacity:
+            self._grow()
+        index = self._size
+        self.states[index] = state
+        self.g[index] = g
+        self.h[index] = h
+        self.f[index] = g + h if f is None else f
+        self.parents[index] = parent
+        if self.dots is not None:
+            self.dots[index] = np.nan
+        self._size += 1
+        return index
+
+    def set_dots(self, index, dots):
+        if self.dots is None:
+            dots = np.asarray(dots)
+            self.dots = np.full((self._capacity,) + dots.shape, np.nan)
+        self.dots[index] = dots
+
+    def discard_last(self, index):
+        '''
+        Frees node index if it is the last added one (e.g. generated, but not used)
+        '''
+        if index == self._size - 1:
+            self._size -= 1
+
+    def make_path(self, index):
+        '''
+        Returns list of states from the root to node index by tracing parent indices
+        '''
+        indices = []
+        while index != -1:
+            indices.append(index)
+            index = self.parents[index]
+        return list(self.states[indices[::-1]])
+
+
+class PoolNode:
+    __slots__ = ('pool', 'index')
+
+    def __init__(self, pool: NodePool, index: int):
+        '''
+        Lightweight view of node index in NodePool with the SearchTreeNode interface
+        '''
+        self.pool = pool
+        self.index = index
+
+    @property
+    def state(self):
+        return self.pool.states[self.index]
+
+    @property
+    def g(self):
+        return self.pool.g[self.index]
+
+    @property
+    def h(self):
+        return self.pool.h[self.index]
+
+    @property
+    def f(self):
+        return self.pool.f[self.index]
+
+    @property
+    def dots(self):
+        if self.pool.dots is None or np.isnan(self.pool.dots[self.index, 0, 0]):
+            return None
+        return self.pool.dots[self.index]
+
+    @dots.setter
+    def dots(self, dots):
+        if dots is not None:
+            self.pool.set_dots(self.index, dots)
+
+    @property
+    def parent(self):
+        parent = self.pool.parents[self.index]
+        if parent == -1:
+            return None
+        return PoolNode(self.pool, parent)
+
+    def get_state(self):
+        return self.state
+
+    def key(self):
+        state = self.state
+        if state.ndim:
+            return tuple(state)
+        return state.item()
+
+    def __eq__(self, other):
+        return np.all(self.state == other.state)
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __lt__(self, other):
+        return self.f < other.f
+
+
+class PoolSearchTree(SearchTree):
+
+    def __init__(self, capacity=1024):
+        '''
+        SearchTree, which stores nodes in NodePool.
+        OPEN is a heap of (f, index) pairs and CLOSED is a dict of state key -> node index,
+        so no Python node objects are kept alive. OPEN and CLOSED properties return PoolNode views.
+        '''
+        super().__init__()
+        self._closed = {}
+        self.pool = NodePool(capacity)
+
+    def __len__(self):
+        return len(self.pool)
+
+    def create_node(self, state, g=0, h=0, f=None, parent=None):
+        parent_index = -1 if parent is None else parent.index
+        return PoolNode(self.pool, self.pool.add(state, g, h, f, parent_index))
+
+    def discard_node(self, item):
+        self.pool.discard_last(item.index)
+
+    def add_to_open(self, item):
+        heappush(self._open, (float(item.f), item.index))
+
+    def get_best_node_from_open(self):
+        while len(self._open) > 0:
+            _, index = heappop(self._open)
+            item = PoolNode(self.pool, index)
+            if not self.was_expanded(item):
+                return item
+        return None
+
+    def add_to_closed(self, item):
+        self._closed[item.key()] = item.index
+
+    def was_expanded(self, item):
+        return item.key() in self._closed
+
+    @property
+    def OPEN(self):
+        return [PoolNode(self.pool, index) for _, index in self._open]
+
+    @property
+    def CLOSED(self):
+        return [PoolNode(self.pool, index) for index in self._closed.values()]
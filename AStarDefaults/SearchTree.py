@@ -1,4 +1,5 @@
 from heapq import heappop, heappush, heapify
+from AStarDefaults.SearchTreeNode import SearchTreeNode
 
 class SearchTree:  
 
@@ -12,6 +13,15 @@ class SearchTree:
     def open_is_empty(self):
         return len(self._open) == 0
 
+    def create_node(self, state, g=0, h=0, f=None, parent=None):
+        return SearchTreeNode(state, g, h, f, parent)
+
+    def discard_node(self, item):
+        '''
+        Called for created nodes, which were not added to the tree
+        '''
+        pass
+
     def add_to_open(self, item):
         heappush(self._open, item)
 
@@ -36,3 +46,127 @@ class SearchTree:
     @property
     def CLOSED(self):
         return self._closed
+
+
+class IndexedHeap:
+
+    def __init__(self):
+        '''
+        Binary min-heap of items with unique keys, which supports decrease-key.
+        Position of every key in heap is stored in self._index.
+        '''
+        self.items = []
+        self._keys = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key):
+        return self.items[self._index[key]]
+
+    def push(self, key, item):
+        self.items.append(item)
+        self._keys.append(key)
+        self._index[key] = len(self.items) - 1
+        self._sift_up(len(self.items) - 1)
+
+    def decrease(self, key, item):
+        '''
+        Replaces item of key by a smaller one
+        '''
+        position = self._index[key]
+        self.items[position] = item
+        self._sift_up(position)
+
+    def pop(self):
+        item = self.items[0]
+        del self._index[self._keys[0]]
+        last_item, last_key = self.items.pop(), self._keys.pop()
+        if self.items:
+            self.items[0], self._keys[0] = last_item, last_key
+            self._index[last_key] = 0
+            self._sift_down(0)
+        return item
+
+    def _swap(self, i, j):
+        self.items[i], self.items[j] = self.items[j], self.items[i]
+        self._keys[i], self._keys[j] = self._keys[j], self._keys[i]
+        self._index[self._keys[i]] = i
+        self._index[self._keys[j]] = j
+
+    def _sift_up(self, position):
+        while position > 0:
+            parent = (position - 1) // 2
+            if not self.items[position] < self.items[parent]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position):
+        size = len(self.items)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self.items[child] < self.items[smallest]:
+                    smallest = child
+            if smallest == position:
+                break
+            self._swap(position, smallest)
+            position = smallest
+
+
+class DuplicateAwareSearchTree(SearchTree):
+
+    def __init__(self, decrease_key=False):
+        '''
+        SearchTree, which keeps best g-value of every state in OPEN
+        and doesn't push nodes dominated by an already queued copy of the same state.
+
+        decrease_key: if True OPEN is an IndexedHeap with at most one node per state,
+                      otherwise dominated copies left in OPEN are skipped lazily on pop.
+        '''
+        super().__init__()
+        self._decrease_key = decrease_key
+        if decrease_key:
+            self._open = IndexedHeap()
+        self._best_g = {}
+        self.duplicates_avoided = 0
+
+    def add_to_open(self, item):
+        key = item.key()
+        best_g = self._best_g.get(key)
+        if best_g is not None and best_g <= item.g:
+            self.duplicates_avoided += 1
+            return
+        self._best_g[key] = item.g
+        if not self._decrease_key:
+            heappush(self._open, item)
+        elif key in self._open:
+            self._open.decrease(key, item)
+        else:
+            self._open.push(key, item)
+
+    def get_best_node_from_open(self):
+        while len(self._open) > 0:
+            if self._decrease_key:
+                item = self._open.pop()
+            else:
+                item = heappop(self._open)
+            if self.was_expanded(item) or item.g > self._best_g.get(item.key(), item.g):
+                continue
+            return item
+        return None
+
+    def add_to_closed(self, item):
+        self._best_g.pop(item.key(), None)
+        self._closed.add(item)
+
+    @property
+    def OPEN(self):
+        if self._decrease_key:
+            return self._open.items
+        return self._open
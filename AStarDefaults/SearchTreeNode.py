@@ -1,5 +1,9 @@
+import numpy as np
+
 class SearchTreeNode():
-    def __init__(self, state, g = 0, h = 0, f = None, parent = None, path_from_parent=None):
+    __slots__ = ('state', 'g', 'h', 'f', 'parent', 'dots')
+
+    def __init__(self, state, g = 0, h = 0, f = None, parent = None, path_from_parent=None, dots=None):
         '''
         Node class represents a search node
         
@@ -8,6 +12,7 @@ class SearchTreeNode():
         - h: h-value of the node
         - F: f-value of the node
         - parent: pointer to the parent-node
+        - dots: cached joint coordinates of state (optional)
 
         '''
         self.state = state
@@ -18,6 +23,7 @@ class SearchTreeNode():
         else:
             self.f = f        
         self.parent = parent
+        self.dots = dots
 
     def get_state(self):
         '''
@@ -25,11 +31,20 @@ class SearchTreeNode():
         '''
         return self.state
     
+    def key(self):
+        '''
+        Hashable representation of state
+        '''
+        if isinstance(self.state, np.ndarray):
+            return tuple(self.state)
+        # lattice states are already hashable (packed int keys or tuples of bins)
+        return self.state
+
     def __eq__(self, other):
-        return (self.state == other.state).all()
+        return np.all(self.state == other.state)
     
     def __hash__(self):
-        return hash(tuple(self.state))
+        return hash(self.key())
 
     def __lt__(self, other): 
         return self.f < other.f
\ No newline at end of file
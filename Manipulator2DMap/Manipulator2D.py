@@ -2,7 +2,6 @@ import numpy as np
 import matplotlib.pyplot as plt
 import itertools
 import time
-from functools import lru_cache
 import heapq
 from matplotlib.widgets import Slider
 from ipywidgets import interact
@@ -39,6 +38,15 @@ class Manipulator_2d_supervisor():
         self.move_cost = self.deltas * (np.argmax(np.abs(self.possible_moves), -1) + 1)
         self.ground_level = ground_level
         self.distanse_between_edges = distanse_between_edges
+        # rotation by k bins as complex number cos + i sin, used by calculate_successors_dots
+        self.rotation_table = np.exp(1j * self.deltas * np.arange(angle_discretization))
+        self._move_joints = np.argmax(np.abs(self.possible_moves), -1)
+        move_bins = np.where(self.possible_moves.sum(-1) > 0, 1, angle_discretization - 1)
+        self._moves_rotation = (np.arange(num_joints + 1) > self._move_joints[:, np.newaxis]) * \
+                               (self.rotation_table[move_bins] - 1)[:, np.newaxis]
+        # all pairs of non-adjacent segments, used by position_intersection_batch
+        self.segment_pairs = np.array([(i, j) for i in range(num_joints - 1)
+                                              for j in range(i + 2, num_joints)], dtype=int).reshape(-1, 2)
         
     def calculate_dots(self, angles):
         '''
@@ -64,7 +72,48 @@ class Manipulator_2d_supervisor():
         x = np.sum(np.cos(global_angles) * self.lengths)
         y = np.sum(np.sin(global_angles) * self.lengths)
         return (x, y)
+
+    def calculate_dots_batch(self, angles):
+        '''
+        Batch version of calculate_dots.
+
+        angles: np.ndarray(N, num_joints) of local angles
+        return: dots - np.ndarray(N, num_joints + 1, 2) with coordinates x,y of each joint
+        '''
+        angles = np.atleast_2d(angles)
+        global_angles = np.cumsum(angles, axis=-1)
+        dots = np.zeros((angles.shape[0], self.num_joints + 1, 2))
+        np.cumsum(np.cos(global_angles) * self.lengths, axis=-1, out=dots[:, 1:, 0])
+        np.cumsum(np.sin(global_angles) * self.lengths, axis=-1, out=dots[:, 1:, 1])
+        return dots
+
+    def calculate_end_batch(self, angles):
+        '''
+        Batch version of calculate_end.
+
+        angles: np.ndarray(N, num_joints) of local angles
+        return: np.ndarray(N, 2) with coordinates x,y of last point of each state
+        '''
+        global_angles = np.cumsum(np.atleast_2d(angles), axis=-1)
+        ends = np.empty((global_angles.shape[0], 2))
+        ends[:, 0] = np.cos(global_angles) @ self.lengths
+        ends[:, 1] = np.sin(global_angles) @ self.lengths
+        return ends
     
+    def calculate_successors_dots(self, dots):
+        '''
+        Incremental forward kinematics for possible_moves.
+        Move of joint j rotates all joints after j around joint j,
+        so dots of all neighbours are derived from dots of the parent state
+        without recomputing cumsum, cos and sin.
+
+        dots: np.ndarray(num_joints + 1, 2) of parent state
+        return: np.ndarray(len(possible_moves), num_joints + 1, 2) in order of possible_moves
+        '''
+        dots = np.ascontiguousarray(dots, dtype=np.float64).view(np.complex128)[:, 0]
+        successors = dots + (dots - dots[self._move_joints][:, np.newaxis]) * self._moves_rotation
+        return successors.view(np.float64).reshape(len(self.possible_moves), self.num_joints + 1, 2)
+
     def calculate_distance_between_states(self, angles_1, angles_2):
         '''
         Calculates distanst between states like a difference between angles
@@ -88,6 +137,21 @@ class Manipulator_2d_supervisor():
             random_state = random_delta_numbers * self.deltas - PI
             random_state[0] += PI / 2
         return random_state
+
+    def generate_random_states(self, num_states):
+        '''
+        Batch version of generate_random_state.
+        return: np.ndarray(num_states, num_joints) of correct random lattice states
+        '''
+        states = np.empty((0, self.num_joints))
+        while len(states) < num_states:
+            random_delta_numbers = np.random.randint(0, self.angle_discretization, (2 * num_states, self.num_joints))
+            random_states = random_delta_numbers * self.deltas - PI
+            random_states[:, 0] += PI / 2
+            correct = self.check_angles_correctness_batch(random_states) & \
+                      self.position_correctness_batch(random_states)
+            states = np.concatenate([states, random_states[correct]])
+        return states[:num_states]
     
     
     def dot_on_segment(self, x1, y1, x2, y2, x3, y3): 
@@ -120,13 +184,13 @@ class Manipulator_2d_supervisor():
         o4 = self.orientation(x3, y3, x4, y4, x2, y2) 
         if (o1 != o2) and (o3 != o4): 
             return True
-        if (o1 == 0) and self.dot_on_segment(x1, y1, x3, y3, x2, y2): 
+        if (o1 == 'collinear') and self.dot_on_segment(x1, y1, x3, y3, x2, y2): 
             return True
-        if (o2 == 0) and self.dot_on_segment(x1, y1, x4, y4, x2, y2): 
+        if (o2 == 'collinear') and self.dot_on_segment(x1, y1, x4, y4, x2, y2): 
             return True
-        if (o3 == 0) and self.dot_on_segment(x3, y3, x1, y1, x4, y4): 
+        if (o3 == 'collinear') and self.dot_on_segment(x3, y3, x1, y1, x4, y4): 
             return True
-        if (o4 == 0) and self.dot_on_segment(x3, y3, x2, y2, x4, y4): 
+        if (o4 == 'collinear') and self.dot_on_segment(x3, y3, x2, y2, x4, y4): 
             return True
         return False
     
@@ -172,6 +236,40 @@ class Manipulator_2d_supervisor():
                     return False
         return True
 
+    def position_intersection_batch(self, dots: np.ndarray) -> np.ndarray:
+        '''
+        Batch version of position_intersection.
+        Checks all pairs of non-adjacent segments of all states at once.
+
+        dots: np.ndarray(N, num_joints + 1, 2) from calculate_dots_batch
+        return: bool np.ndarray(N,), True if NO self-intersection
+        '''
+        if len(self.segment_pairs) == 0:
+            return np.ones(dots.shape[0], dtype=bool)
+        first, second = self.segment_pairs.T
+        p1, q1 = dots[:, first], dots[:, first + 1]
+        p2, q2 = dots[:, second], dots[:, second + 1]
+
+        def orientation(a, b, c):
+            val = (b[..., 1] - a[..., 1]) * (c[..., 0] - b[..., 0]) - \
+                  (b[..., 0] - a[..., 0]) * (c[..., 1] - b[..., 1])
+            return np.sign(val)
+
+        def dot_on_segment(a, b, c):
+            # b lies in bounding box of segment (a, c)
+            return ((b <= np.maximum(a, c)) & (b >= np.minimum(a, c))).all(axis=-1)
+
+        o1 = orientation(p1, q1, p2)
+        o2 = orientation(p1, q1, q2)
+        o3 = orientation(p2, q2, p1)
+        o4 = orientation(p2, q2, q1)
+        intersect = ((o1 != o2) & (o3 != o4)) | \
+                    ((o1 == 0) & dot_on_segment(p1, p2, q1)) | \
+                    ((o2 == 0) & dot_on_segment(p1, q2, q1)) | \
+                    ((o3 == 0) & dot_on_segment(p2, p1, q2)) | \
+                    ((o4 == 0) & dot_on_segment(p2, q1, q2))
+        return ~intersect.any(axis=-1)
+
     def position_correctness(self, angles):
         '''
         Checking if possition is correct 
@@ -182,22 +280,47 @@ class Manipulator_2d_supervisor():
         return self.position_intersection(dots) and \
                 (dots[1:, 1] > self.ground_level).all()
 
+    def position_correctness_batch(self, angles, dots=None):
+        '''
+        Batch version of position_correctness
+        input: np.ndarray(N, num_joints) of angles, optionally their precomputed dots
+        return: bool np.ndarray(N,)
+        '''
+        if dots is None:
+            dots = self.calculate_dots_batch(angles)
+        return self.position_intersection_batch(dots) & \
+                (dots[:, 1:, 1] > self.ground_level).all(axis=-1)
+
     def check_angles_correctness(self, angles):
         return (np.abs(angles[1:]) < (PI - self.angles_constraints[1:])).all()
+
+    def check_angles_correctness_batch(self, angles):
+        return (np.abs(angles[:, 1:]) < (PI - self.angles_constraints[1:])).all(axis=-1)
     
 
-    def get_successors(self, angles):
+    def get_successors_batch(self, angles, dots=None):
         '''
-        Returns massive, which elements are [<elements of moves massive>, <x, y of end>]
+        Builds all neighbours of angles and checks them in one pass
+        (angles constraints, self-intersection and ground level).
+
+        dots: precomputed dots of angles. If given, dots of neighbours are computed incrementally
+        return: (states, move_costs, dots) of correct neighbours as np.ndarrays
         '''
         possible_neighbours = self.possible_moves + angles
-        successors = []
-        for successor_state, move_cost in zip(possible_neighbours, self.move_cost):
-            if not self.check_angles_correctness(successor_state):
-                continue
-            if self.position_correctness(successor_state):
-                successors.append((successor_state, move_cost))
-        return successors
+        if dots is None:
+            dots = self.calculate_dots_batch(possible_neighbours)
+        else:
+            dots = self.calculate_successors_dots(dots)
+        correct = self.check_angles_correctness_batch(possible_neighbours) & \
+                  self.position_correctness_batch(possible_neighbours, dots)
+        return possible_neighbours[correct], self.move_cost[correct], dots[correct]
+
+    def get_successors(self, angles):
+        '''
+        Returns massive, which elements are (successor_state, move_cost)
+        '''
+        states, move_costs, _ = self.get_successors_batch(angles)
+        return list(zip(states, move_costs))
 
     def are_states_directly_connected(self, begin_state, end_state):
         connect_path = []
@@ -1,7 +1,12 @@
 from typing import List 
 from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
-from Manipulator2DMap.obstacle import Obstacle
-from Manipulator2DMap.inverse_kinematics import inverse_kinematics
+from Manipulator2DMap.obstacle import Obstacle, SphereObstacle, ObstacleSet
+from Manipulator2DMap.inverse_kinematics import inverse_kinematics, inverse_kinematics_batch
+from Manipulator2DMap.lattice import Lattice
+from Manipulator2DMap.collision_cache import CollisionCache, scene_fingerprint
+from Manipulator2DMap.occupancy import OccupancyMap
+from Manipulator2DMap.reachability import ReachabilityMap
+from Manipulator2DMap.edge_checker import EdgeChecker
 from abc import ABC, abstractmethod
 import numpy as np
 import matplotlib.pyplot as plt
@@ -21,31 +26,77 @@ class GridMap2D:
                        start_angles,
                        goal_position,
                        heuristic = None,
-                       obstacles: List[Obstacle] = []):
+                       obstacles: List[Obstacle] = [],
+                       collision_cache: CollisionCache = None,
+                       occupancy_map: OccupancyMap = None,
+                       reachability_map: ReachabilityMap = None,
+                       continuous_edges: bool = False):
         '''
         Constructor of map
         manipulator: Manipulator_2d_supervisor to work with manipulator
         start_position: start_position
         goal_position = ((x, y), angle) x,y are cords of finish
                         angle is finish angle
+        collision_cache: CollisionCache for checks of lattice states, may be shared between maps
+        occupancy_map: precomputed OccupancyMap of the scene (see build_occupancy_map)
+        reachability_map: ReachabilityMap for inverse kinematics warm starts (see build_reachability_map)
+        continuous_edges: if True successors are kept only if motion to them is correct (see EdgeChecker)
         '''
         self._manipulator = manipulator
-        r = manipulator.radius
-        self._map = np.zeros((r * 2, r))
+        self._lattice = Lattice(manipulator)
+        self._collision_cache = collision_cache
+        self._occupancy_map = occupancy_map
+        self._reachability_map = reachability_map
+        self._continuous_edges = continuous_edges
+        self._edge_checker = EdgeChecker(self)
         self._start_angles = start_angles
         self._goal_position = np.array(goal_position[0])
         print(f"print goal position {self._goal_position}")
         self._goal_angle = goal_position[1]
         self._heuristic_function = heuristic
         self._obstacles = obstacles
+        self.update_obstacles()
         # print(self._obstacles)
         if not self.valid(self._start_angles):
             self._start_angles = None
         self.cnt = 0
-        self.inverse_angles = inverse_kinematics(self._goal_position, manipulator)
+        self.inverse_angles = self.solve_inverse_kinematics(self._goal_position)
+
+    def solve_inverse_kinematics(self, point, num_of_starts=10, tol=1e-2):
+        '''
+        Inverse kinematics of point. If reachability map is set, its configurations
+        are used as warm starts, and optimization is skipped if one of them is already within tol.
+        '''
+        if self._reachability_map is not None:
+            seeds = self._reachability_map.seeds(point, num_of_starts)
+            if len(seeds) > 0:
+                losss = np.linalg.norm(self._manipulator.calculate_end_batch(seeds) - point, axis=-1)
+                if losss.min() < tol:
+                    return seeds[np.argmin(losss)].copy()
+                return inverse_kinematics(point, self._manipulator, seeds=seeds)
+        return inverse_kinematics(point, self._manipulator, num_of_starts=num_of_starts)
     
+    def goal_states(self, num_states=32, max_batches=8):
+        '''
+        Returns np.ndarray(k, num_joints) of correct states, which satisfy is_goal.
+        They are found by inverse kinematics of goal position from num_states random seeds,
+        target orientations are sampled over the whole orientation tolerance of is_goal
+        (for the exact goal angle there are only a few solutions, which often collide).
+        Batches are drawn until at least one goal state is found or max_batches are tried,
+        so the result may be empty.
+        '''
+        positions = np.repeat(self._goal_position[np.newaxis], num_states, axis=0)
+        for _ in range(max_batches):
+            orientations = self._goal_angle - PI / 2 + np.random.uniform(-5 * self.eps, 5 * self.eps, num_states)
+            states, _ = inverse_kinematics_batch(positions, self._manipulator, num_of_starts=1,
+                                                 orientations=orientations)
+            states = states[self.is_goal_batch(states) & self.check_states_batch(states)]
+            if len(states):
+                return states
+        return states
+
     def sample_point_on_map(self):
-        r = self._map.shape[0]
+        r = self._manipulator.radius
         x = random.uniform(-r, r)
         y = random.uniform(0, r)
         point = np.array([x,y])
@@ -56,25 +107,115 @@ class GridMap2D:
         return point
     
     def check_point_correct(self, point):
-        for obs in self._obstacles:
+        if self._obstacle_set.in_sphere(point):
+            return False
+        for obs in self._other_obstacles:
             if obs.in_sphere(point):
                 return False
         return True
-    
+
+    def update_obstacles(self):
+        '''
+        Rebuilds obstacles arrays. Must be called after self._obstacles is changed.
+        '''
+        self._obstacle_set = ObstacleSet([obs for obs in self._obstacles if isinstance(obs, SphereObstacle)])
+        self._other_obstacles = [obs for obs in self._obstacles if not isinstance(obs, SphereObstacle)]
+        self._fingerprint = scene_fingerprint(self._manipulator, self._obstacles)
+
+    def add_obstacle(self, obstacle: Obstacle):
+        self._obstacles = self._obstacles + [obstacle]
+        self.update_obstacles()
+
+    def remove_obstacle(self, obstacle: Obstacle):
+        self._obstacles = [obs for obs in self._obstacles if obs is not obstacle]
+        self.update_obstacles()
+
+    def move_obstacle(self, obstacle: SphereObstacle, center):
+        '''
+        Moves sphere obstacle (one of self._obstacles) to center
+        '''
+        obstacle.center = np.asarray(center, dtype=float)
+        self.update_obstacles()
+
     def set_start(self, angles):
         self._start_angles = angles
     
     def get_start(self):
         return self._start_angles
 
-    def valid(self, angles):
-        dots = self._manipulator.calculate_dots(angles)
+    def set_occupancy_map(self, occupancy_map: OccupancyMap):
+        self._occupancy_map = occupancy_map
 
-        for obs in self._obstacles:
-            if obs.intersect(angles, self._manipulator):
-                return False
-        return True
+    def _active_occupancy_map(self):
+        '''
+        Returns occupancy map if it was built for the current scene
+        '''
+        if self._occupancy_map is None or self._occupancy_map.fingerprint != self._fingerprint:
+            return None
+        return self._occupancy_map
+
+    def valid(self, angles):
+        occupancy = self._active_occupancy_map()
+        if occupancy is not None and self._lattice.on_lattice(angles) and \
+           occupancy.is_free(self._lattice.angles_to_keys(angles)):
+            return True
+        return self.valid_batch(np.atleast_2d(angles))[0]
     
+    def valid_batch(self, states, dots=None):
+        '''
+        Batch version of valid. Returns bool np.ndarray(N,), True if state doesn't intersect obstacles
+        '''
+        if dots is None:
+            dots = self._manipulator.calculate_dots_batch(states)
+        valid = ~self._obstacle_set.intersect_batch(states, self._manipulator, dots)
+        for obs in self._other_obstacles:
+            valid &= ~obs.intersect_batch(states, self._manipulator, dots)
+        return valid
+
+    def check_states_batch(self, states, dots=None):
+        '''
+        Full check of states: angles constraints, ground level, self-intersection and obstacles.
+        Results for lattice states are looked up in occupancy map or collision cache, if they are set.
+        Returns bool np.ndarray(N,), True if state is correct
+        '''
+        occupancy = self._active_occupancy_map()
+        if occupancy is None and self._collision_cache is None:
+            return self._check_states_batch(states, dots)
+        keys = self._lattice.angles_to_keys(states)
+        on_lattice = self._lattice.on_lattice(states)
+        correct = np.zeros(len(states), dtype=bool)
+        unknown = np.ones(len(states), dtype=bool)
+        if occupancy is not None:
+            correct[on_lattice] = occupancy.is_free_batch(keys[on_lattice])
+            unknown[on_lattice] = False
+        else:
+            correct[on_lattice], known = self._collision_cache.get_batch(self._fingerprint, keys[on_lattice])
+            unknown[on_lattice] = ~known
+        if unknown.any():
+            correct[unknown] = self._check_states_batch(states[unknown], None if dots is None else dots[unknown])
+            to_store = unknown & on_lattice
+            if self._collision_cache is not None and to_store.any():
+                self._collision_cache.put_batch(self._fingerprint, keys[to_store], correct[to_store])
+        return correct
+
+    def _check_states_batch(self, states, dots=None):
+        '''
+        Direct check of states. Lattice states are checked at exact angles of their bins
+        (see Lattice.snap), like in build_occupancy_map, so the result doesn't depend on float drift
+        and matches occupancy map and collision cache. Dots of snapped states are recomputed.
+        '''
+        snapped = self._lattice.snap(states)
+        moved = (snapped != states).any(axis=-1)
+        states = snapped
+        if dots is None:
+            dots = self._manipulator.calculate_dots_batch(states)
+        elif moved.any():
+            dots = dots.copy()
+            dots[moved] = self._manipulator.calculate_dots_batch(states[moved])
+        return self._manipulator.check_angles_correctness_batch(states) & \
+               self._manipulator.position_correctness_batch(states, dots) & \
+               self.valid_batch(states, dots)
+
     def random_init_start(self):
         state = self._manipulator.generate_random_state()
         while not self.valid(state):
@@ -90,6 +231,13 @@ class GridMap2D:
     
     def dist_to_finish(self, angles):
         return np.linalg.norm(self._manipulator.calculate_end(angles) - self._goal_position)
+
+    def dist_to_finish_batch(self, states):
+        '''
+        Batch version of dist_to_finish for np.ndarray(N, num_joints) of states
+        '''
+        ends = self._manipulator.calculate_end_batch(states)
+        return np.linalg.norm(ends - self._goal_position, axis=-1)
     
     def heuristic(self, angles):
         if self._heuristic_function is not None:
@@ -100,12 +248,49 @@ class GridMap2D:
         weight = 1 / (10 + euclid + angle_dist)
         return euclid + weight * angle_dist
     
+    def heuristic_batch(self, states):
+        if self._heuristic_function is not None:
+            return np.array([self.heuristic(state) for state in states])
+        euclid = self.dist_to_finish_batch(states)
+        angle_dist = self.angle_to_finish_batch(states)
+        weight = 1 / (10 + euclid + angle_dist)
+        return euclid + weight * angle_dist
+
+    def get_successors_batch(self, angles, dots=None, return_dots=False):
+        '''
+        Returns (states, move_costs) np.ndarrays of all valid successors of angles.
+        All checks (angles constraints, ground, self-intersection, obstacles) are done in one pass.
+
+        dots: precomputed dots of angles, used for incremental kinematics of successors
+        return_dots: if True dots of successors are returned as third element
+        Successors of lattice states are snapped to lattice (see Lattice.snap), so they are checked
+        the same way with and without occupancy map or collision cache.
+        '''
+        states = self._lattice.snap(self._manipulator.possible_moves + angles)
+        if dots is None:
+            successors_dots = self._manipulator.calculate_dots_batch(states)
+        else:
+            successors_dots = self._manipulator.calculate_successors_dots(dots)
+        correct = self.check_states_batch(states, successors_dots)
+        states, move_costs, successors_dots = states[correct], self._manipulator.move_cost[correct], successors_dots[correct]
+        if self._continuous_edges and len(states):
+            free = self.check_edges_batch(np.repeat(np.asarray(angles)[np.newaxis], len(states), 0), states)
+            states, move_costs, successors_dots = states[free], move_costs[free], successors_dots[free]
+        if return_dots:
+            return states, move_costs, successors_dots
+        return states, move_costs
+
+    def check_edges_batch(self, starts, ends):
+        '''
+        Continuous check of motions starts[i] -> ends[i], returns bool np.ndarray(E,)
+        '''
+        return self._edge_checker.check_edges_batch(starts, ends)
+
+    def check_edge(self, start, end):
+        return self._edge_checker.check_edge(start, end)
+
     def get_successors(self, angles):
-        successors = []
-        for succ, move_cost in self._manipulator.get_successors(angles):
-            if not self._obstacles or self.valid(succ):
-                successors.append((succ, move_cost))
-        return successors
+        return list(zip(*self.get_successors_batch(angles)))
 
     def angle_to_finish(self, angles):
         last_angle = (np.sum(angles) + PI / 2) % (2 * PI)
@@ -115,5 +300,12 @@ class GridMap2D:
         #     last_angle += PI
         return abs(last_angle - self._goal_angle)
 
+    def angle_to_finish_batch(self, states):
+        last_angles = (np.sum(states, axis=-1) + PI / 2) % (2 * PI)
+        return np.abs(last_angles - self._goal_angle)
+
     def is_goal(self, angles):
-        return self.dist_to_finish(angles) < self.eps and self.angle_to_finish(angles) < 5 * self.eps
\ No newline at end of file
+        return self.dist_to_finish(angles) < self.eps and self.angle_to_finish(angles) < 5 * self.eps
+
+    def is_goal_batch(self, states):
+        return (self.dist_to_finish_batch(states) < self.eps) & (self.angle_to_finish_batch(states) < 5 * self.eps)
\ No newline at end of file
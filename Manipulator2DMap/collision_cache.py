@@ -0,0 +1,111 @@
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor
+
+
+def scene_fingerprint(manipulator: Manipulator_2d_supervisor, obstacles=[]):
+    '''
+    Returns hex string, which identifies manipulator parameters and obstacles.
+    Collision results of a state are the same for equal fingerprints.
+    '''
+    description = [manipulator.num_joints, manipulator.angle_discretization,
+                   list(np.asarray(manipulator.lengths, dtype=float)),
+                   list(np.asarray(manipulator.angles_constraints, dtype=float)),
+                   float(manipulator.ground_level)]
+    for obs in obstacles:
+        if hasattr(obs, 'center') and hasattr(obs, 'r'):
+            description.append((type(obs).__name__, list(np.asarray(obs.center, dtype=float)), float(obs.r)))
+        else:
+            description.append(repr(obs))
+    return hashlib.sha1(repr(description).encode()).hexdigest()
+
+
+class CollisionCache:
+
+    def __init__(self, maxsize=1000000, path=None):
+        '''
+        Bounded LRU cache of state correctness, shared between searches.
+        Entries are keyed by (scene fingerprint, packed lattice key),
+        so one cache may serve several scenes.
+
+        maxsize: maximum number of stored states
+        path: .npz file to load cache from (if exists) and save to
+        '''
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, fingerprint, key):
+        '''
+        Returns stored correctness of state key or None
+        '''
+        entry = (fingerprint, int(key))
+        value = self._entries.get(entry)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(entry)
+        return value
+
+    def put(self, fingerprint, key, value):
+        entry = (fingerprint, int(key))
+        self._entries[entry] = bool(value)
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_batch(self, fingerprint, keys):
+        '''
+        Returns (values, known) bool np.ndarrays, values are meaningful only where known is True
+        '''
+        values = np.zeros(len(keys), dtype=bool)
+        known = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            value = self.get(fingerprint, key)
+            if value is not None:
+                values[i] = value
+                known[i] = True
+        return values, known
+
+    def put_batch(self, fingerprint, keys, values):
+        for key, value in zip(keys, values):
+            self.put(fingerprint, key, value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.}
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, path=None):
+        '''
+        Saves entries in LRU order to .npz file
+        '''
+        path = self.path if path is None else path
+        fingerprints = [fingerprint for fingerprint, _ in self._entries]
+        keys = [key for _, key in self._entries]
+        np.savez(path, fingerprints=np.array(fingerprints, dtype=str),
+                 keys=np.array(keys, dtype=np.int64),
+                 values=np.array(list(self._entries.values()), dtype=bool))
+
+    def load(self, path):
+        '''
+        Adds entries from .npz file, saved by save
+        '''
+        with np.load(path) as data:
+            for fingerprint, key, value in zip(data['fingerprints'], data['keys'], data['values']):
+                self.put(str(fingerprint), key, value)
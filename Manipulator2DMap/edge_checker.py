@@ -0,0 +1,117 @@
+import numpy as np
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI, TWO_PI
+
+
+def angle_differences(angles_1, angles_2):
+    '''
+    Shortest signed differences angles_2 - angles_1 in [-PI, PI) with respect to wrap-around
+    '''
+    return (np.asarray(angles_2) - angles_1 + PI) % TWO_PI - PI
+
+
+def points_to_segments_distances(points, starts, ends):
+    '''
+    Distances from points to segments (starts, ends), all arrays have shape (..., 2)
+    '''
+    vecs = ends - starts
+    t = ((points - starts) * vecs).sum(-1) / np.maximum((vecs * vecs).sum(-1), 1e-12)
+    diff = points - starts - np.clip(t, 0, 1)[..., np.newaxis] * vecs
+    return np.sqrt((diff * diff).sum(-1))
+
+
+class EdgeChecker:
+
+    def __init__(self, space_map, tolerance=1e-2):
+        '''
+        Continuous check of straight motions between states.
+        Angles are interpolated linearly along the shortest (wrap-aware) differences.
+        When joint angles change by d, no point of the arm moves farther than
+        sweep(d) = sum_j |d_j| * reaches_j, where reaches_j is the length of the arm from joint j.
+        So a piece of edge between correct states a and b is free, if sweep < clearance(a) + clearance(b).
+        Pieces, which are not proved free, are bisected and all their middle states of one level
+        are checked in one batch. Edge is rejected as soon as one of its states is incorrect.
+
+        space_map: GridMap2D, its check_states_batch is used for states of edges
+        tolerance: pieces with smaller sweep are accepted without further bisection
+                   (it is the only criterion near obstacles, which don't provide clearance)
+        '''
+        self.space_map = space_map
+        self.tolerance = tolerance
+        self.checked_states = 0
+        manipulator: Manipulator_2d_supervisor = space_map._manipulator
+        self.reaches = np.cumsum(manipulator.lengths[::-1])[::-1]
+
+    def sweep_batch(self, diffs):
+        '''
+        Upper bounds of displacement of any arm point for angle changes diffs
+        '''
+        return np.abs(diffs) @ self.reaches
+
+    def clearance_batch(self, states, dots=None):
+        '''
+        Lower bounds of distance, which arms of states may move by without becoming incorrect:
+        distance to ground level, to sphere obstacles and half of distance between
+        non-adjacent arms (both of them move). Other obstacles give zero clearance.
+        '''
+        manipulator: Manipulator_2d_supervisor = self.space_map._manipulator
+        if dots is None:
+            dots = manipulator.calculate_dots_batch(states)
+        clearance = (dots[:, 1:, 1] - manipulator.ground_level).min(-1)
+        obstacle_set = self.space_map._obstacle_set
+        if len(obstacle_set):
+            distances = np.sqrt(obstacle_set.segments_squared_distances(dots)) - obstacle_set.radii
+            clearance = np.minimum(clearance, distances.min(axis=(1, 2)))
+        if self.space_map._other_obstacles:
+            clearance = np.minimum(clearance, 0)
+        if len(manipulator.segment_pairs):
+            first, second = manipulator.segment_pairs.T
+            p1, q1 = dots[:, first], dots[:, first + 1]
+            p2, q2 = dots[:, second], dots[:, second + 1]
+            # distance between not intersecting segments is reached at one of their ends
+            distances = np.minimum(np.minimum(points_to_segments_distances(p1, p2, q2), points_to_segments_distances(q1, p2, q2)),
+                                   np.minimum(points_to_segments_distances(p2, p1, q1), points_to_segments_distances(q2, p1, q1)))
+            clearance = np.minimum(clearance, distances.min(-1) / 2)
+        return clearance
+
+    def _check_states(self, states):
+        self.checked_states += len(states)
+        dots = self.space_map._manipulator.calculate_dots_batch(states)
+        return self.space_map.check_states_batch(states, dots), self.clearance_batch(states, dots)
+
+    def check_edges_batch(self, starts, ends):
+        '''
+        Checks motions starts[i] -> ends[i] (np.ndarrays(E, num_joints)).
+        return: bool np.ndarray(E,), True if the whole motion is correct
+        '''
+        manipulator: Manipulator_2d_supervisor = self.space_map._manipulator
+        starts = np.atleast_2d(np.asarray(starts, dtype=float))
+        diffs = angle_differences(starts, np.atleast_2d(ends))
+        # angles constraints are intervals, so it's enough to check unwrapped ends of edges
+        valid = manipulator.check_angles_correctness_batch(starts + diffs)
+        correct, clearance = self._check_states(np.concatenate([starts, starts + diffs]))
+        valid &= correct[:len(starts)] & correct[len(starts):]
+        sweeps = self.sweep_batch(diffs)
+
+        # pieces of edges: edge index, begin and end parameters, clearances at begin and end
+        edges = np.flatnonzero(valid)
+        begins, ends = np.zeros(len(edges)), np.ones(len(edges))
+        begin_clearance, end_clearance = clearance[:len(starts)][edges], clearance[len(starts):][edges]
+        while len(edges):
+            piece_sweeps = (ends - begins) * sweeps[edges]
+            unproved = (piece_sweeps >= begin_clearance + end_clearance) & (piece_sweeps > self.tolerance)
+            edges, begins, ends = edges[unproved], begins[unproved], ends[unproved]
+            begin_clearance, end_clearance = begin_clearance[unproved], end_clearance[unproved]
+            if not len(edges):
+                break
+            middles = (begins + ends) / 2
+            correct, middle_clearance = self._check_states(starts[edges] + middles[:, np.newaxis] * diffs[edges])
+            valid[edges[~correct]] = False
+            alive = valid[edges]
+            edges = np.concatenate([edges[alive], edges[alive]])
+            begins, ends = np.concatenate([begins[alive], middles[alive]]), np.concatenate([middles[alive], ends[alive]])
+            begin_clearance = np.concatenate([begin_clearance[alive], middle_clearance[alive]])
+            end_clearance = np.concatenate([middle_clearance[alive], end_clearance[alive]])
+        return valid
+
+    def check_edge(self, start, end):
+        return bool(self.check_edges_batch(np.asarray(start)[np.newaxis], np.asarray(end)[np.newaxis])[0])
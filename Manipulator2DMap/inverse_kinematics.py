@@ -1,21 +1,92 @@
 import numpy as np
-from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI, TWO_PI
 
-def inverse_kinematics(position, man: Manipulator_2d_supervisor, alpha = 1e-2, num_of_starts=10, max_step=1000):
-    states = np.array([man.generate_random_state() for _ in range(num_of_starts)])
-    length = man.lengths
-    end_effectors = np.array([man.calculate_end(state) for state in states])
-    losss = np.linalg.norm(position - end_effectors, axis=1)
+
+def _residuals(states, targets, orientations, man: Manipulator_2d_supervisor):
+    '''
+    Returns (errors, jacobians) of states: errors of end effector positions (and orientations, if given)
+    and their Jacobians over local angles
+    '''
+    global_angles = np.cumsum(states, axis=-1)
+    lcoss = np.cos(global_angles) * man.lengths
+    lsins = np.sin(global_angles) * man.lengths
+    errors = [targets[:, 0] - lcoss.sum(-1), targets[:, 1] - lsins.sum(-1)]
+    # d end / d local angle j = sum over k >= j of d end / d global angle k
+    jacobians = [-np.cumsum(lsins[:, ::-1], axis=-1)[:, ::-1], np.cumsum(lcoss[:, ::-1], axis=-1)[:, ::-1]]
+    if orientations is not None:
+        errors.append((orientations - global_angles[:, -1] + PI) % TWO_PI - PI)
+        jacobians.append(np.ones_like(states))
+    return np.stack(errors, -1), np.stack(jacobians, 1)
+
+
+def inverse_kinematics_batch(positions, man: Manipulator_2d_supervisor, alpha=1., num_of_starts=10, 
+                             max_step=1000, tol=1e-2, damping=1e-1, seeds=None, orientations=None):
+    '''
+    Solves inverse kinematics for many target points at once.
+    Every target is optimized from num_of_starts seeds with damped least squares steps
+    using the Jacobian of the end effector over local angles (global angles are their cumsum).
+    Seeds of a target are frozen as soon as one of them reaches it, 
+    optimization stops when all targets are reached or after max_step steps.
+
+    positions: np.ndarray(T, 2) of target points
+    alpha: step size (1 is full damped least squares step)
+    tol: distance to target, which is considered as reached
+    damping: damping factor of least squares
+    seeds: np.ndarray(T, num_of_starts, num_joints) of initial states, random states by default
+    orientations: np.ndarray(T,) of target global angles of the last arm (optional)
+    return: (states, losses) - np.ndarray(T, num_joints) of best states and np.ndarray(T,) of their 
+            distances to targets (norms of position and orientation errors, if orientations are given)
+    '''
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    num_targets = len(positions)
+    if seeds is None:
+        seeds = man.generate_random_states(num_targets * num_of_starts)
+    states = np.array(seeds, dtype=float).reshape(num_targets, -1, man.num_joints)
+    num_of_starts = states.shape[1]
+    states = states.reshape(-1, man.num_joints)
+    targets = np.repeat(positions, num_of_starts, axis=0)
+    if orientations is not None:
+        orientations = np.repeat(np.asarray(orientations, dtype=float).reshape(-1), num_of_starts)
+
+    active = np.ones(len(states), dtype=bool)
     step = 0
-    while losss.min() > 1e-2:
-        lsins = np.sin(states) * length[np.newaxis, :]
-        lcoss = np.cos(states) * length[np.newaxis, :]
-        grads = 2 * ((end_effectors[:, 0] - position[0])[:, np.newaxis] * lcoss - 
-                    (end_effectors[:, 1] - position[1])[:, np.newaxis] * lsins)
-        states -= alpha * grads
-        end_effectors = np.array([man.calculate_end(state) for state in states])
-        losss = np.array([np.linalg.norm(position - end_effector) for end_effector in end_effectors])
-        step += 1
-        if step > max_step:
+    while True:
+        active_orientations = None if orientations is None else orientations[active]
+        errors, jacobians = _residuals(states[active], targets[active], active_orientations, man)
+        losss = np.linalg.norm(errors, axis=-1)
+
+        # freeze all seeds of reached targets
+        reached = np.zeros(num_targets, dtype=bool)
+        reached[np.flatnonzero(active)[losss < tol] // num_of_starts] = True
+        still_active = ~np.repeat(reached, num_of_starts)[active]
+        if step >= max_step or not still_active.any():
             break
-    return states[np.argmin(losss)]
\ No newline at end of file
+        if not still_active.all():
+            active[np.flatnonzero(active)[~still_active]] = False
+            errors, jacobians = errors[still_active], jacobians[still_active]
+
+        # damped least squares: J^T (J J^T + damping^2 I)^-1 errors
+        gram = jacobians @ jacobians.transpose(0, 2, 1) + damping ** 2 * np.eye(errors.shape[-1])
+        weights = np.linalg.solve(gram, errors[..., np.newaxis])
+        states[active] += alpha * (jacobians.transpose(0, 2, 1) @ weights)[..., 0]
+        step += 1
+
+    errors, _ = _residuals(states, targets, orientations, man)
+    losss = np.linalg.norm(errors, axis=-1).reshape(num_targets, num_of_starts)
+    best = np.argmin(losss, axis=-1)
+    states = states.reshape(num_targets, num_of_starts, man.num_joints)[np.arange(num_targets), best]
+    # wrap angles to ranges of generated states: [-PI/2, 3PI/2) for the first joint and [-PI, PI) for others
+    offsets = np.full(man.num_joints, PI)
+    offsets[0] -= PI / 2
+    states = (states + offsets) % TWO_PI - offsets
+    return states, losss[np.arange(num_targets), best]
+
+
+def inverse_kinematics(position, man: Manipulator_2d_supervisor, alpha=1., num_of_starts=10, max_step=1000, seeds=None):
+    '''
+    Returns state, which end effector is the closest to position (see inverse_kinematics_batch)
+    '''
+    if seeds is not None:
+        seeds = np.asarray(seeds)[np.newaxis]
+    states, _ = inverse_kinematics_batch(np.asarray(position)[np.newaxis], man, alpha, num_of_starts, max_step, seeds=seeds)
+    return states[0]
@@ -0,0 +1,146 @@
+import numpy as np
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+
+
+class Lattice:
+    def __init__(self, manipulator: Manipulator_2d_supervisor):
+        '''
+        Integer lattice over angle_discretization bins of every joint.
+        Bin b of joint j is the angle b * deltas + offsets[j], like in generate_random_state.
+        Every state is packed to a single int64 key: sum(bins[j] * size ** j).
+        If keys don't fit int64 (num_joints * log2(size) >= 63), lattice only converts
+        angles and bins, and packing raises ValueError (packable is False).
+
+        manipulator: Manipulator_2d_supervisor, which discretization is used
+        '''
+        self.num_joints = manipulator.num_joints
+        self.size = manipulator.angle_discretization
+        self.deltas = manipulator.deltas
+        self.offsets = np.full(self.num_joints, -PI)
+        self.offsets[0] += PI / 2
+        self.packable = self.num_joints * np.log2(self.size) < 63
+        self.radix = self.size ** np.arange(self.num_joints, dtype=np.int64) if self.packable else None
+        self.num_cells = int(self.size) ** self.num_joints
+        self.moves = np.concatenate([np.eye(self.num_joints, dtype=np.int64),
+                                     -np.eye(self.num_joints, dtype=np.int64)], 0)
+
+    def angles_to_bins(self, angles):
+        '''
+        Nearest lattice bins of angles, np.ndarray(..., num_joints) of int64
+        '''
+        return np.rint((np.asarray(angles) - self.offsets) / self.deltas).astype(np.int64) % self.size
+
+    def bins_to_angles(self, bins):
+        return bins * self.deltas + self.offsets
+
+    def on_lattice(self, angles, tol=1e-6):
+        '''
+        True if angles lie on lattice (up to tol)
+        '''
+        diffs = (np.asarray(angles) - self.offsets) / self.deltas
+        return (np.abs(diffs - np.rint(diffs)) < tol).all(axis=-1)
+
+    def snap(self, angles, tol=1e-6):
+        '''
+        States, which lie on lattice (up to tol), are replaced by exact angles of their bins
+        (the same angles as keys_to_angles of their keys), other states are returned unchanged.
+        Removes float drift of states built by adding moves, so checks of a lattice state
+        don't depend on the path it was reached by.
+        '''
+        angles = np.asarray(angles, dtype=float)
+        diffs = (angles - self.offsets) / self.deltas
+        on_lattice = (np.abs(diffs - np.rint(diffs)) < tol).all(axis=-1)
+        snapped = self.bins_to_angles(np.rint(diffs).astype(np.int64) % self.size)
+        return np.where(on_lattice[..., np.newaxis], snapped, angles)
+
+    def check_packable(self):
+        if not self.packable:
+            raise ValueError("lattice is too large to pack states to int64 keys")
+
+    def pack(self, bins):
+        self.check_packable()
+        return bins @ self.radix
+
+    def unpack(self, keys):
+        self.check_packable()
+        return (np.asarray(keys, dtype=np.int64)[..., np.newaxis] // self.radix) % self.size
+
+    def angles_to_keys(self, angles):
+        return self.pack(self.angles_to_bins(angles))
+
+    def keys_to_angles(self, keys):
+        return self.bins_to_angles(self.unpack(keys))
+
+    def neighbours(self, key):
+        '''
+        Bins of all single-joint +-1 moves from key, in order of possible_moves
+        '''
+        return (self.unpack(key) + self.moves) % self.size
+
+
+class LatticeMap:
+    def __init__(self, space_map):
+        '''
+        Lattice mode of GridMap2D for discretized search.
+        States are packed int keys (see Lattice), so hashing and duplicate
+        detection are exact. Angles are materialized only for geometry checks.
+
+        space_map: GridMap2D with manipulator, obstacles and goal
+        '''
+        self._space_map = space_map
+        self._manipulator = space_map._manipulator
+        self.lattice = Lattice(self._manipulator)
+        self.lattice.check_packable()
+
+    def get_start(self):
+        start = self._space_map.get_start()
+        if start is None:
+            return None
+        return int(self.lattice.angles_to_keys(start))
+
+    def to_angles(self, key):
+        return self.lattice.keys_to_angles(key)
+
+    def path_to_angles(self, path):
+        '''
+        Converts path of keys (from make_path) to np.ndarray(len(path), num_joints) of angles
+        '''
+        return self.lattice.keys_to_angles(np.array(path, dtype=np.int64))
+
+    def get_successors_batch(self, key, dots=None, return_dots=False):
+        '''
+        Same as GridMap2D.get_successors_batch, but for packed keys
+        '''
+        bins = self.lattice.neighbours(key)
+        states = self.lattice.bins_to_angles(bins)
+        if dots is None:
+            successors_dots = self._manipulator.calculate_dots_batch(states)
+        else:
+            successors_dots = self._manipulator.calculate_successors_dots(dots)
+        correct = self._space_map.check_states_batch(states, successors_dots)
+        keys, move_costs = self.lattice.pack(bins[correct]), self._manipulator.move_cost[correct]
+        if return_dots:
+            return keys, move_costs, successors_dots[correct]
+        return keys, move_costs
+
+    def get_successors(self, key):
+        keys, move_costs = self.get_successors_batch(key)
+        return [(int(successor), move_cost) for successor, move_cost in zip(keys, move_costs)]
+
+    def valid(self, key):
+        return self._space_map.check_states_batch(self.to_angles(np.atleast_1d(key)))[0]
+
+    def heuristic(self, key):
+        return self._space_map.heuristic(self.to_angles(key))
+
+    def heuristic_batch(self, keys):
+        return self._space_map.heuristic_batch(self.to_angles(keys))
+
+    def dist_to_finish(self, key):
+        return self._space_map.dist_to_finish(self.to_angles(key))
+
+    def is_goal(self, key):
+        return self._space_map.is_goal(self.to_angles(key))
+
+    def is_goal_batch(self, keys):
+        return self._space_map.is_goal_batch(self.to_angles(keys))
@@ -1,5 +1,6 @@
 from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor
 from abc import ABC, abstractmethod
+from typing import List
 import numpy as np
 
 class Obstacle(ABC):
@@ -7,14 +8,26 @@ class Obstacle(ABC):
     def intersect(self, manipulator: Manipulator_2d_supervisor) -> bool:
         pass
 
+    def intersect_batch(self, angles, manipulator: Manipulator_2d_supervisor, dots=None) -> np.ndarray:
+        '''
+        Batch version of intersect. Returns bool np.ndarray(N,), True if state intersects obstacle
+        '''
+        if dots is None:
+            dots = manipulator.calculate_dots_batch(angles)
+        return np.array([self.intersect(state, manipulator, state_dots) 
+                         for state, state_dots in zip(angles, dots)], dtype=bool)
+
 
 class SphereObstacle(Obstacle): 
     def __init__(self, center: np.ndarray, r: float): 
         self.center = center
         self.r = r 
 
-    def intersect(self, angles, manipulator: Manipulator_2d_supervisor) -> bool:
-        joint_coordinates = manipulator.calculate_dots(angles) 
+    def intersect(self, angles, manipulator: Manipulator_2d_supervisor, dots=None) -> bool:
+        '''
+        dots: precomputed joint coordinates of angles (calculate_dots or a row of calculate_dots_batch)
+        '''
+        joint_coordinates = manipulator.calculate_dots(angles) if dots is None else dots
         for i in range(len(joint_coordinates) - 1):
             if np.linalg.norm(joint_coordinates[i] - self.center) < self.r or np.linalg.norm(joint_coordinates[i + 1] - self.center) < self.r: 
                 return True
@@ -24,5 +37,63 @@ class SphereObstacle(Obstacle):
                 return True
         return False
     
+    def intersect_batch(self, angles, manipulator: Manipulator_2d_supervisor, dots=None) -> np.ndarray:
+        if dots is None:
+            dots = manipulator.calculate_dots_batch(angles)
+        starts = dots[:, :-1]
+        arm_vecs = dots[:, 1:] - starts
+        # projection of center on every arm, clipped to the segment
+        t = np.einsum('nsk,nsk->ns', self.center - starts, arm_vecs) / np.einsum('nsk,nsk->ns', arm_vecs, arm_vecs)
+        closest = starts + np.clip(t, 0, 1)[..., np.newaxis] * arm_vecs
+        return (np.linalg.norm(closest - self.center, axis=-1) < self.r).any(axis=-1)
+
     def in_sphere(self, point):
         return np.linalg.norm(point - self.center) <= self.r
+
+
+class ObstacleSet(Obstacle):
+    def __init__(self, obstacles: List[SphereObstacle] = []):
+        '''
+        Container of sphere obstacles, stored as contiguous arrays
+        so that all of them are checked in one broadcasted operation.
+
+        obstacles: list of SphereObstacle
+        '''
+        self.centers = np.array([obs.center for obs in obstacles], dtype=float).reshape(-1, 2)
+        self.radii = np.array([obs.r for obs in obstacles], dtype=float)
+
+    def __len__(self):
+        return len(self.radii)
+
+    def segments_distances(self, dots: np.ndarray) -> np.ndarray:
+        '''
+        Distances from every arm segment to every obstacle center.
+
+        dots: np.ndarray(N, num_joints + 1, 2) from calculate_dots_batch
+        return: np.ndarray(N, num_joints, num_obstacles)
+        '''
+        return np.sqrt(self.segments_squared_distances(dots))
+
+    def segments_squared_distances(self, dots: np.ndarray) -> np.ndarray:
+        starts = dots[:, :-1, np.newaxis]
+        arm_vecs = dots[:, 1:, np.newaxis] - starts
+        to_centers = self.centers - starts
+        # projection of every center on every arm, clipped to the segment
+        t = (to_centers * arm_vecs).sum(-1) / (arm_vecs * arm_vecs).sum(-1)
+        diff = to_centers - np.clip(t, 0, 1)[..., np.newaxis] * arm_vecs
+        return (diff * diff).sum(-1)
+
+    def intersect(self, angles, manipulator: Manipulator_2d_supervisor, dots=None) -> bool:
+        if dots is not None:
+            dots = dots[np.newaxis]
+        return self.intersect_batch(np.atleast_2d(angles), manipulator, dots)[0]
+
+    def intersect_batch(self, angles, manipulator: Manipulator_2d_supervisor, dots=None) -> np.ndarray:
+        if dots is None:
+            dots = manipulator.calculate_dots_batch(angles)
+        if len(self) == 0:
+            return np.zeros(dots.shape[0], dtype=bool)
+        return (self.segments_squared_distances(dots) < self.radii ** 2).any(axis=(1, 2))
+
+    def in_sphere(self, point):
+        return (np.linalg.norm(point - self.centers, axis=-1) <= self.radii).any()
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from Manipulator2DMap.lattice import Lattice
+
+
+class OccupancyMap:
+
+    def __init__(self, bits: np.ndarray, lattice: Lattice, fingerprint: str):
+        '''
+        Bit-packed occupancy of the whole discretized configuration space.
+        Bit number key (little bit order) is 1 if lattice state key is correct
+        (angles constraints, ground, self-intersection and obstacles).
+
+        bits: np.ndarray or np.memmap of uint8 with ceil(lattice.num_cells / 8) elements
+        lattice: Lattice of the manipulator
+        fingerprint: scene_fingerprint of the scene the map was built for
+        '''
+        self.bits = bits
+        self.lattice = lattice
+        self.fingerprint = fingerprint
+
+    def is_free_batch(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return ((self.bits[keys >> 3] >> (keys & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def is_free(self, key):
+        return bool(self.is_free_batch([key])[0])
+
+    def free_fraction(self):
+        return np.unpackbits(self.bits, bitorder='little')[:self.lattice.num_cells].mean()
+
+
+def occupancy_map_path(directory, space_map):
+    return os.path.join(directory, f'{space_map._fingerprint}.occ')
+
+
+def build_occupancy_map(space_map, directory, chunk_size=1 << 16):
+    '''
+    Checks every lattice state of space_map in chunks of chunk_size states
+    (so memory is bounded) and writes bit-packed result to a memory-mapped file
+    in directory, named by the scene fingerprint.
+
+    return: OccupancyMap
+    '''
+    lattice = space_map._lattice
+    lattice.check_packable()
+    chunk_size = max(8, chunk_size - chunk_size % 8)
+    os.makedirs(directory, exist_ok=True)
+    bits = np.memmap(occupancy_map_path(directory, space_map), dtype=np.uint8, mode='w+',
+                     shape=((lattice.num_cells + 7) // 8,))
+    for begin in range(0, lattice.num_cells, chunk_size):
+        keys = np.arange(begin, min(begin + chunk_size, lattice.num_cells), dtype=np.int64)
+        correct = space_map._check_states_batch(lattice.keys_to_angles(keys))
+        packed = np.packbits(correct, bitorder='little')
+        bits[begin // 8: begin // 8 + len(packed)] = packed
+    bits.flush()
+    return OccupancyMap(bits, lattice, space_map._fingerprint)
+
+
+def load_occupancy_map(space_map, directory):
+    '''
+    Memory-maps occupancy map of space_map scene from directory.
+    Returns None if it wasn't built yet.
+    '''
+    path = occupancy_map_path(directory, space_map)
+    if not os.path.exists(path):
+        return None
+    lattice = space_map._lattice
+    bits = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(bits) != (lattice.num_cells + 7) // 8:
+        raise ValueError(f"occupancy map {path} doesn't match lattice size")
+    return OccupancyMap(bits, lattice, space_map._fingerprint)
@@ -0,0 +1,104 @@
+import numpy as np
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor
+
+
+class ReachabilityMap:
+
+    def __init__(self, radius, num_joints, cell_size=0.5, per_cell=4):
+        '''
+        2D workspace grid over [-radius, radius] x [0, radius].
+        Every cell stores up to per_cell correct configurations,
+        which put the end effector in that cell. Used as inverse kinematics warm starts.
+
+        radius: reach of manipulator
+        num_joints: number of manipulator joints
+        cell_size: size of a grid cell
+        per_cell: maximum number of configurations in a cell
+        '''
+        self.radius = float(radius)
+        self.cell_size = float(cell_size)
+        self.shape = (int(np.ceil(2 * self.radius / cell_size)), int(np.ceil(self.radius / cell_size)))
+        self.configs = np.zeros(self.shape + (per_cell, num_joints))
+        self.counts = np.zeros(self.shape, dtype=np.int64)
+
+    @property
+    def per_cell(self):
+        return self.configs.shape[2]
+
+    def cells(self, points):
+        '''
+        Returns (cells, inside) - np.ndarray(N, 2) of cell indices and bool mask of points inside grid
+        '''
+        points = np.atleast_2d(points)
+        cells = np.floor((points - [-self.radius, 0]) / self.cell_size).astype(np.int64)
+        inside = ((cells >= 0) & (cells < self.shape)).all(axis=-1)
+        return cells, inside
+
+    def add(self, states, ends):
+        '''
+        Adds states with end effectors ends to their cells, while cells are not full
+        '''
+        cells, inside = self.cells(ends)
+        states, cells = states[inside], cells[inside]
+        flat = np.ravel_multi_index(cells.T, self.shape)
+        order = np.argsort(flat, kind='stable')
+        flat, states = flat[order], states[order]
+        # rank of every state among states of the same cell
+        first = np.searchsorted(flat, flat, side='left')
+        slots = self.counts.flat[flat] + np.arange(len(flat)) - first
+        fits = slots < self.per_cell
+        configs = self.configs.reshape(-1, self.per_cell, self.configs.shape[-1])
+        configs[flat[fits], slots[fits]] = states[fits]
+        np.add.at(self.counts.reshape(-1), flat[fits], 1)
+
+    def lookup(self, point):
+        '''
+        Returns np.ndarray(k, num_joints) of configurations stored in the cell of point
+        '''
+        cells, inside = self.cells(point)
+        if not inside[0]:
+            return self.configs[0, 0, :0]
+        ix, iy = cells[0]
+        return self.configs[ix, iy, :self.counts[ix, iy]]
+
+    def seeds(self, point, num_seeds, max_ring=3):
+        '''
+        Returns up to num_seeds configurations from the cell of point and cells around it
+        '''
+        cells, _ = self.cells(point)
+        ix, iy = np.clip(cells[0], 0, np.array(self.shape) - 1)
+        for ring in range(max_ring + 1):
+            x_range = slice(max(ix - ring, 0), ix + ring + 1)
+            y_range = slice(max(iy - ring, 0), iy + ring + 1)
+            counts = self.counts[x_range, y_range]
+            configs = self.configs[x_range, y_range]
+            found = configs[np.arange(self.per_cell) < counts[..., np.newaxis]]
+            if len(found) >= num_seeds:
+                break
+        return found[:num_seeds]
+
+    def save(self, path):
+        np.savez(path, radius=self.radius, cell_size=self.cell_size, configs=self.configs, counts=self.counts)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            reachability_map = cls(data['radius'], data['configs'].shape[-1], data['cell_size'], data['configs'].shape[2])
+            reachability_map.configs = data['configs']
+            reachability_map.counts = data['counts']
+        return reachability_map
+
+
+def build_reachability_map(space_map, num_samples=100000, cell_size=0.5, per_cell=4, batch_size=10000):
+    '''
+    Samples num_samples random correct states of space_map (no obstacle intersections)
+    in batches and stores them in ReachabilityMap by end effector position.
+    '''
+    manipulator: Manipulator_2d_supervisor = space_map._manipulator
+    reachability_map = ReachabilityMap(manipulator.radius, manipulator.num_joints, cell_size, per_cell)
+    for begin in range(0, num_samples, batch_size):
+        states = manipulator.generate_random_states(min(batch_size, num_samples - begin))
+        dots = manipulator.calculate_dots_batch(states)
+        valid = space_map.valid_batch(states, dots)
+        reachability_map.add(states[valid], dots[valid, -1])
+    return reachability_map
@@ -0,0 +1,106 @@
+import numpy as np
+from Manipulator2DMap.edge_checker import angle_differences
+
+
+def segments_lengths(path):
+    '''
+    Lengths (calculate_distance_between_states) of path segments, np.ndarray(len(path) - 1,)
+    '''
+    path = np.asarray(path)
+    return np.abs(angle_differences(path[:-1], path[1:])).sum(-1)
+
+
+def path_length(path):
+    return segments_lengths(path).sum()
+
+
+def greedy_shortcut(space_map, path):
+    '''
+    From every kept waypoint jumps to the farthest waypoint, which is reachable by a correct motion.
+    Motions to all later waypoints are checked in one batch (space_map.check_edges_batch).
+    return: np.ndarray of kept waypoints
+    '''
+    path = np.asarray(path, dtype=float)
+    kept = [0]
+    while kept[-1] < len(path) - 1:
+        current = kept[-1]
+        targets = np.arange(current + 2, len(path))
+        free = space_map.check_edges_batch(np.repeat(path[current][np.newaxis], len(targets), 0), path[targets])
+        reachable = targets[free]
+        kept.append(reachable[-1] if len(reachable) else current + 1)
+    return path[kept]
+
+
+def points_on_path(path, positions):
+    '''
+    States at distances positions along path.
+    return: (states, segments) - np.ndarray(k, num_joints) of states and indices of segments they lie on
+    '''
+    lengths = segments_lengths(path)
+    cumulative = np.concatenate([[0], np.cumsum(lengths)])
+    segments = np.clip(np.searchsorted(cumulative, positions, side='right') - 1, 0, len(lengths) - 1)
+    fractions = (positions - cumulative[segments]) / np.maximum(lengths[segments], 1e-12)
+    diffs = angle_differences(path[segments], path[segments + 1])
+    return path[segments] + fractions[:, np.newaxis] * diffs, segments
+
+
+def random_shortcut(space_map, path, num_iterations=100, batch_size=32):
+    '''
+    Every iteration samples batch_size random pairs of points along path (not only waypoints),
+    checks motions between them in one batch and replaces the part of path between them 
+    by the free shortcut, which saves the most length.
+
+    num_iterations: number of batches
+    return: np.ndarray of waypoints
+    '''
+    path = np.asarray(path, dtype=float)
+    for _ in range(num_iterations):
+        if len(path) < 3:
+            break
+        total = path_length(path)
+        positions = np.sort(np.random.uniform(0, total, (batch_size, 2)), axis=-1)
+        firsts, first_segments = points_on_path(path, positions[:, 0])
+        lasts, last_segments = points_on_path(path, positions[:, 1])
+        gains = positions[:, 1] - positions[:, 0] - np.abs(angle_differences(firsts, lasts)).sum(-1)
+        # shortcuts inside one segment can't save anything
+        candidates = np.flatnonzero((gains > 1e-9) & (first_segments < last_segments))
+        if not len(candidates):
+            continue
+        candidates = candidates[np.argsort(-gains[candidates])]
+        free = space_map.check_edges_batch(firsts[candidates], lasts[candidates])
+        if free.any():
+            best = candidates[np.argmax(free)]
+            path = np.concatenate([path[:first_segments[best] + 1], firsts[best][np.newaxis], 
+                                   lasts[best][np.newaxis], path[last_segments[best] + 1:]])
+    return path
+
+
+def resample(path, max_velocity, dt=1.):
+    '''
+    Splits path segments, so that no joint moves by more than max_velocity * dt between waypoints.
+    return: np.ndarray of waypoints, consecutive waypoints are dt apart in time
+    '''
+    path = np.asarray(path, dtype=float)
+    diffs = angle_differences(path[:-1], path[1:])
+    num_steps = np.maximum(1, np.ceil(np.abs(diffs).max(-1) / (max_velocity * dt) - 1e-9).astype(np.int64))
+    waypoints = [path[:1]]
+    for start, diff, steps in zip(path[:-1], diffs, num_steps):
+        waypoints.append(start + np.arange(1, steps + 1)[:, np.newaxis] / steps * diff)
+    return np.concatenate(waypoints)
+
+
+def smooth_path(space_map, path, num_iterations=100, batch_size=32, max_velocity=None, dt=1.):
+    '''
+    Post-processing of planned path (e.g. make_path of AStar): greedy shortcutting,
+    then randomized shortcutting, greedy pass over its waypoints again and, 
+    if max_velocity is given, resampling to this joint velocity limit.
+    All shortcuts are verified by continuous edge checks of space_map.
+
+    return: np.ndarray(T, num_joints) of waypoints
+    '''
+    path = greedy_shortcut(space_map, path)
+    path = random_shortcut(space_map, path, num_iterations, batch_size)
+    path = greedy_shortcut(space_map, path)
+    if max_velocity is not None:
+        path = resample(path, max_velocity, dt)
+    return path
@@ -0,0 +1,167 @@
+from Manipulator2DMap.Map import GridMap2D
+from RRTDefaults.nearest_neighbours import NearestNeighbourIndex, wrap_distances
+from RRTDefaults.rrt import check_edges, goal_configurations
+from heapq import heappop, heappush
+import numpy as np
+import time
+
+
+class Roadmap:
+
+    def __init__(self, states, indptr, indices, weights, fingerprint=''):
+        '''
+        Undirected roadmap graph in CSR format: neighbours of node i are
+        indices[indptr[i]:indptr[i + 1]] with edge lengths weights[indptr[i]:indptr[i + 1]].
+
+        states: np.ndarray(N, num_joints) of node states
+        fingerprint: scene_fingerprint of the scene roadmap was built for
+        '''
+        self.states = states
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.states)
+
+    @property
+    def num_edges(self):
+        return len(self.indices) // 2
+
+    def neighbours(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]], self.weights[self.indptr[node]:self.indptr[node + 1]]
+
+    def save(self, path):
+        np.savez(path, states=self.states, indptr=self.indptr, indices=self.indices,
+                 weights=self.weights, fingerprint=self.fingerprint)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['states'], data['indptr'], data['indices'], data['weights'], str(data['fingerprint']))
+
+
+def roadmap_from_edges(states, edges, weights, fingerprint=''):
+    '''
+    Builds CSR Roadmap from np.ndarray(E, 2) of undirected edges
+    '''
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    columns = np.concatenate([edges[:, 1], edges[:, 0]])
+    weights = np.concatenate([weights, weights])
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(len(states) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(states)), out=indptr[1:])
+    return Roadmap(states, indptr, columns[order].astype(np.int64), weights[order], fingerprint)
+
+
+def build_roadmap(space_map: GridMap2D, num_samples, k=10, resolution=None, batch_size=10000):
+    '''
+    Samples num_samples correct states in batches (generate_random_states filtered by
+    check_states_batch), connects every node with its k nearest neighbours and
+    keeps collision-free edges (all checked in batches).
+
+    resolution: resolution of interpolated edge checks (see check_edges), continuous checks by default
+    return: Roadmap
+    '''
+    manipulator = space_map._manipulator
+    states = np.empty((0, manipulator.num_joints))
+    while len(states) < num_samples:
+        samples = manipulator.generate_random_states(min(batch_size, num_samples - len(states)))
+        states = np.concatenate([states, samples[space_map.check_states_batch(samples)]])
+
+    index = NearestNeighbourIndex(manipulator.num_joints)
+    index.insert_batch(states)
+    edges = []
+    for node, state in enumerate(states):
+        neighbours, _ = index.k_nearest(state, k + 1)
+        neighbours = neighbours[neighbours != node]
+        edges.append(np.stack([np.minimum(node, neighbours), np.maximum(node, neighbours)], -1))
+    edges = np.unique(np.concatenate(edges).reshape(-1, 2), axis=0)
+
+    free, _ = check_edges(space_map, states[edges[:, 0]], states[edges[:, 1]], resolution, batch_size * 10)
+    edges = edges[free]
+    weights = wrap_distances(states[edges[:, 0]], states[edges[:, 1]])
+    return roadmap_from_edges(states, edges, weights, space_map._fingerprint)
+
+
+def attach(space_map: GridMap2D, roadmap: Roadmap, state, k, resolution):
+    '''
+    Returns (nodes, distances) of up to k nearest roadmap nodes, which state connects to without collisions
+    '''
+    dists = wrap_distances(roadmap.states, np.asarray(state))
+    nodes = np.argsort(dists, kind='stable')[:k]
+    free, _ = check_edges(space_map, np.repeat(np.asarray(state)[np.newaxis], len(nodes), 0), roadmap.states[nodes],
+                          resolution)
+    return nodes[free], dists[nodes[free]]
+
+
+def query(space_map: GridMap2D, roadmap: Roadmap, k=10, resolution=None, verbose=True):
+    '''
+    Attaches start and goal configurations (goal_configurations, raises ValueError if there are none) to roadmap
+    and finds the shortest path with Dijkstra search.
+
+    k: number of nearest roadmap nodes start and every goal try to connect to
+    return: (found, path, length, stats) like rrt
+    '''
+    if roadmap.fingerprint and roadmap.fingerprint != space_map._fingerprint:
+        raise ValueError("roadmap was built for another scene")
+    start_time = time.time()
+    start = np.asarray(space_map.get_start(), dtype=float)
+    goals = goal_configurations(space_map)
+    num_nodes = len(roadmap)
+
+    # goals get indices num_nodes, num_nodes + 1, ..., start gets index -2
+    goal_edges = {}
+    for goal_index, goal in enumerate(goals):
+        for node, dist in zip(*attach(space_map, roadmap, goal, k, resolution)):
+            goal_edges.setdefault(node, []).append((num_nodes + goal_index, dist))
+
+    dists = np.full(num_nodes + len(goals), np.inf)
+    parents = np.full(num_nodes + len(goals), -1, dtype=np.int64)
+    queue = []
+    direct, _ = check_edges(space_map, np.repeat(start[np.newaxis], len(goals), 0), goals, resolution)
+    for goal_index in np.flatnonzero(direct):
+        dists[num_nodes + goal_index] = wrap_distances(start, goals[goal_index])
+        parents[num_nodes + goal_index] = -2
+        heappush(queue, (dists[num_nodes + goal_index], num_nodes + goal_index))
+    for node, dist in zip(*attach(space_map, roadmap, start, k, resolution)):
+        dists[node] = dist
+        parents[node] = -2
+        heappush(queue, (dist, node))
+
+    found, expanded = False, 0
+    while queue:
+        dist, node = heappop(queue)
+        if dist > dists[node]:
+            continue
+        if node >= num_nodes:
+            found = True
+            break
+        expanded += 1
+        neighbours, weights = roadmap.neighbours(node)
+        new_dists = dist + weights
+        better = new_dists < dists[neighbours]
+        dists[neighbours[better]] = new_dists[better]
+        parents[neighbours[better]] = node
+        for neighbour, new_dist in zip(neighbours[better], new_dists[better]):
+            heappush(queue, (new_dist, neighbour))
+        for goal, weight in goal_edges.get(node, []):
+            if dist + weight < dists[goal]:
+                dists[goal] = dist + weight
+                parents[goal] = node
+                heappush(queue, (dists[goal], goal))
+
+    elapsed = time.time() - start_time
+    stats = {'expanded': expanded, 'goals': len(goals), 'time': elapsed}
+    if verbose:
+        print(f"found = {found} expanded = {expanded} goals = {len(goals)} time = {elapsed * 1000:.1f}ms")
+    if not found:
+        return False, None, None, stats
+    path = [goals[node - num_nodes]]
+    node = parents[node]
+    while node != -2:
+        path.append(roadmap.states[node])
+        node = parents[node]
+    path.append(start)
+    return True, path[::-1], dist, stats
@@ -0,0 +1,183 @@
+import heapq
+import numpy as np
+from Manipulator2DMap.Manipulator2D import TWO_PI
+
+
+def wrap_distances(points, query):
+    '''
+    Distances from query to every point like calculate_distance_between_states:
+    sum of angle differences, which respect wrap-around.
+    '''
+    diffs = np.abs(points - query) % TWO_PI
+    return np.minimum(diffs, TWO_PI - diffs).sum(-1)
+
+
+class NearestNeighbourIndex:
+
+    def __init__(self, num_joints, leaf_size=128, brute_force_size=4096, capacity=1024):
+        '''
+        Incremental nearest neighbour index over joint space (torus)
+        with metric of calculate_distance_between_states.
+        It is a bucket kd-tree over angles normalized to [0, TWO_PI). Every tree node keeps
+        bounds of its region, so lower bound of distance to a region respects wrap-around too.
+        Trees with at most brute_force_size points are searched by a vectorized brute force.
+
+        num_joints: dimension of states
+        leaf_size: maximum number of points in a leaf before it is split
+        brute_force_size: number of points up to which the tree is not used for queries
+        capacity: initial size of points array
+        '''
+        self.num_joints = num_joints
+        self.leaf_size = leaf_size
+        self.brute_force_size = brute_force_size
+        self._points = np.empty((capacity, num_joints))
+        self._size = 0
+        self._split_dims = [-1]
+        self._split_values = [0.]
+        self._children = [None]
+        self._leaves = [np.empty(0, dtype=np.int64)]
+        self._lows = [np.zeros(num_joints)]
+        self._highs = [np.full(num_joints, TWO_PI)]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def points(self):
+        return self._points[:self._size]
+
+    def insert(self, state):
+        '''
+        Adds state and returns its index (indices are given in order of insertion)
+        '''
+        if self._size == len(self._points):
+            points = np.empty((2 * len(self._points), self.num_joints))
+            points[:self._size] = self._points[:self._size]
+            self._points = points
+        point = np.asarray(state, dtype=float) % TWO_PI
+        index = self._size
+        self._points[index] = point
+        self._size += 1
+
+        node = 0
+        while self._children[node] is not None:
+            left, right = self._children[node]
+            node = left if point[self._split_dims[node]] < self._split_values[node] else right
+        self._leaves[node] = np.append(self._leaves[node], index)
+        if len(self._leaves[node]) > self.leaf_size:
+            self._split(node)
+        return index
+
+    def insert_batch(self, states):
+        return np.array([self.insert(state) for state in states], dtype=np.int64)
+
+    def _new_node(self, leaf, low, high):
+        self._split_dims.append(-1)
+        self._split_values.append(0.)
+        self._children.append(None)
+        self._leaves.append(leaf)
+        self._lows.append(low)
+        self._highs.append(high)
+        return len(self._children) - 1
+
+    def _split(self, node):
+        leaf = self._leaves[node]
+        points = self._points[leaf]
+        low, high = self._lows[node], self._highs[node]
+        # split the widest side of region, which has different values
+        for dim in np.argsort(high - low)[::-1]:
+            value = np.median(points[:, dim])
+            goes_left = points[:, dim] < value
+            if goes_left.all() or not goes_left.any():
+                value = (points[:, dim].min() + points[:, dim].max()) / 2
+                goes_left = points[:, dim] < value
+            if goes_left.any() and not goes_left.all():
+                break
+        else:
+            return
+        left_high, right_low = high.copy(), low.copy()
+        left_high[dim] = right_low[dim] = value
+        left = self._new_node(leaf[goes_left], low, left_high)
+        right = self._new_node(leaf[~goes_left], right_low, high)
+        self._split_dims[node] = dim
+        self._split_values[node] = value
+        self._children[node] = (left, right)
+        self._leaves[node] = None
+
+    def _lower_bound(self, point, node):
+        low, high = self._lows[node], self._highs[node]
+        to_low = np.abs(point - low) % TWO_PI
+        to_high = np.abs(point - high) % TWO_PI
+        dists = np.minimum(np.minimum(to_low, TWO_PI - to_low), np.minimum(to_high, TWO_PI - to_high))
+        dists[(point >= low) & (point <= high)] = 0
+        return dists.sum()
+
+    def _search(self, state, max_dist, k=None):
+        '''
+        Best-first search of tree for points within max_dist (and k nearest of them, if k is given)
+        '''
+        point = np.asarray(state, dtype=float) % TWO_PI
+        found_indices, found_dists = [], []
+        bound = max_dist
+        queue = [(0., 0)]
+        while queue:
+            lower_bound, node = heapq.heappop(queue)
+            if lower_bound > bound:
+                break
+            if self._children[node] is not None:
+                for child in self._children[node]:
+                    child_bound = self._lower_bound(point, child)
+                    if child_bound <= bound:
+                        heapq.heappush(queue, (child_bound, child))
+                continue
+            leaf = self._leaves[node]
+            dists = wrap_distances(self._points[leaf], point)
+            close = dists <= bound
+            found_indices.append(leaf[close])
+            found_dists.append(dists[close])
+            if k is not None:
+                indices, dists = np.concatenate(found_indices), np.concatenate(found_dists)
+                if len(dists) > k:
+                    nearest = np.argpartition(dists, k - 1)[:k]
+                    indices, dists = indices[nearest], dists[nearest]
+                found_indices, found_dists = [indices], [dists]
+                if len(dists) == k:
+                    bound = min(bound, dists.max())
+        if not found_indices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(found_indices), np.concatenate(found_dists)
+
+    def k_nearest(self, state, k):
+        '''
+        Returns (indices, distances) of k nearest points sorted by distance
+        '''
+        if self._size <= self.brute_force_size:
+            dists = wrap_distances(self.points, np.asarray(state) % TWO_PI)
+            indices = np.arange(self._size)
+            if self._size > k:
+                indices = np.argpartition(dists, k - 1)[:k]
+                dists = dists[indices]
+        else:
+            indices, dists = self._search(state, np.inf, k)
+        order = np.argsort(dists, kind='stable')
+        return indices[order], dists[order]
+
+    def nearest(self, state):
+        '''
+        Returns (index, distance) of the nearest point
+        '''
+        indices, dists = self.k_nearest(state, 1)
+        return indices[0], dists[0]
+
+    def radius(self, state, max_dist):
+        '''
+        Returns (indices, distances) of all points within max_dist sorted by distance
+        '''
+        if self._size <= self.brute_force_size:
+            dists = wrap_distances(self.points, np.asarray(state) % TWO_PI)
+            indices = np.flatnonzero(dists <= max_dist)
+            dists = dists[indices]
+        else:
+            indices, dists = self._search(state, max_dist)
+        order = np.argsort(dists, kind='stable')
+        return indices[order], dists[order]
@@ -1,14 +1,21 @@
 from Manipulator2DMap.Map import GridMap2D
-from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI, TWO_PI
 from Manipulator2DMap.obstacle import SphereObstacle
 from Manipulator2DMap.inverse_kinematics import inverse_kinematics
-from AStarDefaults.SearchTreeNode import SearchTreeNode
+from Manipulator2DMap.edge_checker import angle_differences
+from AStarDefaults.SearchTree import SearchTree
 from AStarDefaults.AStar import make_path
+from RRTDefaults.nearest_neighbours import NearestNeighbourIndex
 from tqdm import tqdm
+import numpy as np
+import time
 
 
-def create_rrt(space_map: GridMap2D, num_steps, alpha=1e-3):
-    added_nodes = [SearchTreeNode(space_map.get_start())]
+def create_rrt(space_map: GridMap2D, num_steps, alpha=1e-3, search_tree=SearchTree):
+    tree = search_tree()
+    added_nodes = [tree.create_node(space_map.get_start())]
+    index = NearestNeighbourIndex(space_map._manipulator.num_joints)
+    index.insert(space_map.get_start())
     
     num_nodes = 1
     iterations = 0
@@ -17,23 +24,239 @@ def create_rrt(space_map: GridMap2D, num_steps, alpha=1e-3):
         iterations += 1
         
         new_point = space_map.sample_point_on_map()
-        target_angles = inverse_kinematics(new_point, space_map._manipulator)
+        target_angles = space_map.solve_inverse_kinematics(new_point)
         
-        nearest_node = added_nodes[0]
-        best_dist = float('+inf')
-        for selected_node in added_nodes:
-            current_dist = space_map._manipulator.calculate_distance_between_states(selected_node.get_state(), target_angles)
-            if current_dist < best_dist:
-                nearest_node = selected_node
-                best_dist = current_dist
-           
+        nearest_index, _ = index.nearest(target_angles)
+        nearest_node = added_nodes[nearest_index]
+
         diffs = target_angles - nearest_node.get_state()
         
         new_angles = nearest_node.get_state() + alpha * diffs
         
         if space_map.valid(new_angles):
-            new_node = SearchTreeNode(new_angles, parent=nearest_node)
+            new_node = tree.create_node(new_angles, parent=nearest_node)
             added_nodes.append(new_node)
+            index.insert(new_angles)
             num_nodes += 1
             
-    return added_nodes, iterations
\ No newline at end of file
+    return added_nodes, iterations
+
+class RRTTree:
+
+    def __init__(self, num_joints, capacity=1024):
+        '''
+        Tree, which keeps node angles, parent indices and costs from root
+        in growable np.ndarrays together with NearestNeighbourIndex over angles.
+        Parent index -1 means root.
+        '''
+        self.num_joints = num_joints
+        self._states = np.empty((capacity, num_joints))
+        self._parents = np.empty(capacity, dtype=np.int64)
+        self._costs = np.empty(capacity)
+        self._size = 0
+        self._children = []
+        self.index = NearestNeighbourIndex(num_joints)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def states(self):
+        return self._states[:self._size]
+
+    @property
+    def parents(self):
+        return self._parents[:self._size]
+
+    @property
+    def costs(self):
+        return self._costs[:self._size]
+
+    def add(self, state, parent=-1, cost=0.):
+        if self._size == len(self._states):
+            for name in ('_states', '_parents', '_costs'):
+                old = getattr(self, name)
+                new = np.empty((2 * len(old),) + old.shape[1:], dtype=old.dtype)
+                new[:self._size] = old[:self._size]
+                setattr(self, name, new)
+        index = self._size
+        self._states[index] = state
+        self._parents[index] = parent
+        self._costs[index] = cost
+        self._size += 1
+        self._children.append([])
+        if parent != -1:
+            self._children[parent].append(index)
+        self.index.insert(state)
+        return index
+
+    def set_parent(self, index, parent, cost):
+        '''
+        Moves node index under parent with new cost and updates costs of all its descendants
+        '''
+        self._children[self._parents[index]].remove(index)
+        self._children[parent].append(index)
+        self._parents[index] = parent
+        delta = cost - self._costs[index]
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            self._costs[node] += delta
+            stack.extend(self._children[node])
+
+    def nearest(self, state):
+        return self.index.nearest(state)
+
+    def path(self, index):
+        '''
+        Returns list of states from root to node index (like make_path)
+        '''
+        indices = []
+        while index != -1:
+            indices.append(index)
+            index = self._parents[index]
+        return list(self._states[indices[::-1]])
+
+
+def check_edges(space_map: GridMap2D, starts, ends, resolution, batch_size=100000):
+    '''
+    Checks straight (wrap-aware) edges starts[i] -> ends[i]: continuously (space_map.check_edges_batch)
+    if resolution is None, otherwise at interpolated states not farther than resolution from each other.
+    Interpolated edges are sorted by length and checked in chunks of about batch_size states.
+    return: (free, checks) - bool np.ndarray(E,), True if edge is correct, and number of checked states
+    '''
+    if resolution is None:
+        checked_states = space_map._edge_checker.checked_states
+        free = space_map.check_edges_batch(starts, ends)
+        return free, space_map._edge_checker.checked_states - checked_states
+    diffs = angle_differences(starts, ends)
+    num_points = np.maximum(1, np.ceil(np.abs(diffs).sum(-1) / resolution).astype(np.int64))
+    free = np.zeros(len(starts), dtype=bool)
+    checks = 0
+    order = np.argsort(num_points, kind='stable')
+    begin = 0
+    while begin < len(order):
+        # the chunk is sized by the longest of its edges, so it has at most batch_size states
+        longest = min(begin + max(1, batch_size // num_points[order[begin]]), len(order)) - 1
+        max_points = num_points[order[longest]]
+        end = begin + max(1, batch_size // max_points)
+        chunk = order[begin:end]
+        # shorter edges repeat their end state up to max_points
+        steps = np.minimum(np.arange(1, max_points + 1), num_points[chunk, np.newaxis]) / num_points[chunk, np.newaxis]
+        edges = starts[chunk, np.newaxis] + steps[..., np.newaxis] * diffs[chunk, np.newaxis]
+        correct = space_map.check_states_batch(edges.reshape(-1, starts.shape[-1]))
+        free[chunk] = correct.reshape(len(chunk), max_points).all(-1)
+        checks += correct.size
+        begin = end
+    return free, checks
+
+
+def goal_configurations(space_map: GridMap2D):
+    '''
+    Goal states for planners, which need correct goal configurations (e.g. roots of a goal tree):
+    space_map.goal_states or, if none were found, space_map.inverse_angles if they are correct and satisfy is_goal.
+    Raises ValueError if there is no such configuration.
+    '''
+    goal_angles = space_map.goal_states()
+    if len(goal_angles) == 0:
+        goal_angles = np.asarray(space_map.inverse_angles, dtype=float)[np.newaxis]
+        goal_angles = goal_angles[space_map.is_goal_batch(goal_angles) & space_map.check_states_batch(goal_angles)]
+    if len(goal_angles) == 0:
+        raise ValueError("no correct goal configuration found by inverse kinematics")
+    return goal_angles
+
+
+def interpolate_edge(state, diffs, num_points):
+    '''
+    Returns np.ndarray(num_points, num_joints) of states state + t * diffs for t in (0, 1]
+    '''
+    t = np.arange(1, num_points + 1) / num_points
+    return state + t[:, np.newaxis] * diffs
+
+
+def extend(space_map: GridMap2D, tree: RRTTree, target_angles, step_size, resolution):
+    '''
+    Steers from the nearest node of tree towards target_angles at most step_size
+    and adds the new node, if the motion is correct (space_map.check_edge) or,
+    if resolution is given, all states of the edge interpolated with this resolution are correct.
+    return: (new_index, reached, checks) - new_index is -1 if edge is blocked (or target is already in tree),
+            reached is True if new node is target_angles, checks - number of checked states
+    '''
+    nearest_index, dist = tree.nearest(target_angles)
+    if dist == 0:
+        return -1, True, 0
+    nearest_state = tree.states[nearest_index]
+    diffs = angle_differences(nearest_state, target_angles) * min(1., step_size / dist)
+    step_dist = np.abs(diffs).sum()
+    if resolution is None:
+        checked_states = space_map._edge_checker.checked_states
+        free = space_map.check_edge(nearest_state, nearest_state + diffs)
+        checks = space_map._edge_checker.checked_states - checked_states
+    else:
+        edge = interpolate_edge(nearest_state, diffs, max(1, int(np.ceil(step_dist / resolution))))
+        free, checks = space_map.check_states_batch(edge).all(), len(edge)
+    if not free:
+        return -1, False, checks
+    new_index = tree.add(nearest_state + diffs, nearest_index, tree.costs[nearest_index] + step_dist)
+    return new_index, step_dist >= dist, checks
+
+
+def planner_stats(iterations, nodes, collision_checks, elapsed, found, verbose=True):
+    '''
+    Returns dict of planner counters and rates, prints them if verbose
+    '''
+    stats = {'iterations': iterations, 'nodes': nodes, 'collision_checks': collision_checks,
+             'time': elapsed, 'nodes_per_second': nodes / max(elapsed, 1e-9),
+             'checks_per_second': collision_checks / max(elapsed, 1e-9)}
+    if verbose:
+        print(f"found = {found} iterations = {iterations} nodes = {nodes} time = {elapsed:.2f}s "
+              f"nodes/s = {stats['nodes_per_second']:.0f} checks/s = {stats['checks_per_second']:.0f}")
+    return stats
+
+
+def rrt(space_map: GridMap2D, num_steps, step_size=0.5, goal_bias=0.1, resolution=None,
+        sample_in_workspace=False, max_time=None, verbose=True):
+    '''
+    RRT over array-backed RRTTree.
+
+    step_size: maximum distance (calculate_distance_between_states) of one extension
+    goal_bias: probability to extend towards one of goal configurations (space_map.goal_states)
+    resolution: if given, extensions are checked at interpolated states not farther than resolution
+                from each other (all of them in one batch) instead of continuous check of GridMap2D
+    sample_in_workspace: if True samples points on map and solves inverse kinematics
+                         (like create_rrt), otherwise samples random states
+    max_time: stop after max_time seconds
+    return: (found, path, length, stats) - path and length like in make_path,
+            stats - dict with number of iterations, nodes, collision checks and their rates
+    '''
+    manipulator = space_map._manipulator
+    tree = RRTTree(manipulator.num_joints)
+    tree.add(space_map.get_start())
+    goal_angles = space_map.goal_states()
+    if len(goal_angles) == 0:
+        goal_angles = np.asarray(space_map.inverse_angles)[np.newaxis]
+
+    found, goal_index = space_map.is_goal(space_map.get_start()), 0
+    collision_checks = 0
+    iterations = 0
+    start_time = time.time()
+    while not found and iterations < num_steps:
+        if max_time is not None and time.time() - start_time > max_time:
+            break
+        iterations += 1
+        if np.random.rand() < goal_bias:
+            target_angles = goal_angles[np.random.randint(len(goal_angles))]
+        elif sample_in_workspace:
+            target_angles = space_map.solve_inverse_kinematics(space_map.sample_point_on_map())
+        else:
+            target_angles = manipulator.generate_random_state()
+
+        new_index, _, checks = extend(space_map, tree, target_angles, step_size, resolution)
+        collision_checks += checks
+        if new_index != -1 and space_map.is_goal(tree.states[new_index]):
+            found, goal_index = True, new_index
+
+    stats = planner_stats(iterations, len(tree), collision_checks, time.time() - start_time, found, verbose)
+    if not found:
+        return False, None, None, stats
+    return True, tree.path(goal_index), tree.costs[goal_index], stats
@@ -0,0 +1,77 @@
+from Manipulator2DMap.Map import GridMap2D
+from RRTDefaults.rrt import RRTTree, extend, goal_configurations, planner_stats
+import numpy as np
+import time
+
+
+def connect(space_map: GridMap2D, tree: RRTTree, target_angles, step_size, resolution):
+    '''
+    Extends tree towards target_angles until it is reached or an edge is blocked.
+    return: (last_index, reached, checks) - last added node (-1 if none was added)
+    '''
+    last_index, checks = -1, 0
+    while True:
+        new_index, reached, edge_checks = extend(space_map, tree, target_angles, step_size, resolution)
+        checks += edge_checks
+        if new_index == -1:
+            return last_index, reached, checks
+        last_index = new_index
+        if reached:
+            return last_index, True, checks
+
+
+def rrt_connect(space_map: GridMap2D, num_steps, step_size=0.5, resolution=None, max_time=None, verbose=True):
+    '''
+    RRT-Connect: one tree grows from start, another from goal configurations (goal_configurations,
+    raises ValueError if there are none).
+    Every iteration one tree extends towards a random state and the other one greedily
+    connects to the new node, then trees swap roles.
+
+    step_size: maximum distance (calculate_distance_between_states) of one extension
+    resolution: resolution of interpolated edge checks (see rrt), continuous checks by default
+    max_time: stop after max_time seconds
+    return: (found, path, length, stats) like rrt
+    '''
+    manipulator = space_map._manipulator
+    start_tree = RRTTree(manipulator.num_joints)
+    start_tree.add(space_map.get_start())
+    goal_tree = RRTTree(manipulator.num_joints)
+    for goal_angles in goal_configurations(space_map):
+        goal_tree.add(goal_angles)
+
+    found = False
+    collision_checks = 0
+    iterations = 0
+    start_time = time.time()
+    trees = [start_tree, goal_tree]
+    if space_map.is_goal(space_map.get_start()):
+        found, start_index, goal_index = True, 0, -1
+    while not found and iterations < num_steps:
+        if max_time is not None and time.time() - start_time > max_time:
+            break
+        iterations += 1
+        target_angles = manipulator.generate_random_state()
+        new_index, _, checks = extend(space_map, trees[0], target_angles, step_size, resolution)
+        collision_checks += checks
+        if new_index != -1:
+            last_index, reached, checks = connect(space_map, trees[1], trees[0].states[new_index],
+                                                  step_size, resolution)
+            collision_checks += checks
+            if reached:
+                found = True
+                if last_index == -1:
+                    # new node coincides with an existing node of the other tree
+                    last_index, _ = trees[1].nearest(trees[0].states[new_index])
+                start_index, goal_index = (new_index, last_index) if trees[0] is start_tree else (last_index, new_index)
+        trees.reverse()
+
+    stats = planner_stats(iterations, len(start_tree) + len(goal_tree), collision_checks,
+                          time.time() - start_time, found, verbose)
+    if not found:
+        return False, None, None, stats
+    path = start_tree.path(start_index)
+    length = start_tree.costs[start_index]
+    if goal_index != -1:
+        path += goal_tree.path(goal_index)[::-1][1:]
+        length += goal_tree.costs[goal_index]
+    return True, path, length, stats
@@ -0,0 +1,89 @@
+from Manipulator2DMap.Map import GridMap2D
+from RRTDefaults.rrt import RRTTree, angle_differences, check_edges, planner_stats
+import numpy as np
+import time
+
+
+def rrt_star(space_map: GridMap2D, num_steps, step_size=0.5, goal_bias=0.1, gamma=None, max_radius=None,
+             resolution=None, max_time=None, stop_on_first=False, verbose=True):
+    '''
+    RRT* over array-backed RRTTree. New node chooses the cheapest parent among tree nodes
+    within radius min(gamma * (log(n) / n) ^ (1 / num_joints), max_radius) and then rewires
+    them through itself if it makes them cheaper. Neighbours are found with the tree index
+    and all their edges are checked in one batch.
+
+    step_size: maximum distance (calculate_distance_between_states) of one extension
+    goal_bias: probability to extend towards one of goal configurations (space_map.goal_states)
+    gamma: radius constant, num_joints * PI (diameter of the joint space) by default
+    max_radius: upper bound of radius, 2 * step_size by default
+    resolution: resolution of interpolated edge checks (see rrt), continuous checks by default
+    max_time: stop after max_time seconds
+    stop_on_first: stop as soon as the first solution is found
+    return: (found, path, length, stats) like rrt, path is the cheapest one to a goal node.
+            stats also has time and length of the first solution
+    '''
+    manipulator = space_map._manipulator
+    num_joints = manipulator.num_joints
+    gamma = num_joints * np.pi if gamma is None else gamma
+    max_radius = 2 * step_size if max_radius is None else max_radius
+    tree = RRTTree(num_joints)
+    tree.add(space_map.get_start())
+    goal_angles = space_map.goal_states()
+    if len(goal_angles) == 0:
+        goal_angles = np.asarray(space_map.inverse_angles)[np.newaxis]
+
+    goal_indices = [0] if space_map.is_goal(space_map.get_start()) else []
+    first_solution = None
+    collision_checks = 0
+    iterations = 0
+    start_time = time.time()
+    while iterations < num_steps and not (stop_on_first and goal_indices):
+        if max_time is not None and time.time() - start_time > max_time:
+            break
+        iterations += 1
+        if np.random.rand() < goal_bias:
+            target_angles = goal_angles[np.random.randint(len(goal_angles))]
+        else:
+            target_angles = manipulator.generate_random_state()
+
+        nearest_index, dist = tree.nearest(target_angles)
+        if dist == 0:
+            continue
+        nearest_state = tree.states[nearest_index]
+        new_state = nearest_state + angle_differences(nearest_state, target_angles) * min(1., step_size / dist)
+
+        radius = min(gamma * (np.log(len(tree) + 1) / (len(tree) + 1)) ** (1 / num_joints), max_radius)
+        neighbours, neighbour_dists = tree.index.radius(new_state, max(radius, min(dist, step_size)))
+        if nearest_index not in neighbours:
+            neighbours = np.append(neighbours, nearest_index)
+            neighbour_dists = np.append(neighbour_dists, min(dist, step_size))
+        free, checks = check_edges(space_map, np.repeat(new_state[np.newaxis], len(neighbours), 0),
+                                   tree.states[neighbours], resolution)
+        collision_checks += checks
+        if not free.any():
+            continue
+
+        # choose parent
+        costs = tree.costs[neighbours] + neighbour_dists
+        costs[~free] = np.inf
+        best = np.argmin(costs)
+        new_cost = costs[best]
+        new_index = tree.add(new_state, neighbours[best], new_cost)
+
+        # rewire neighbours through new node
+        rewired = free & (new_cost + neighbour_dists < tree.costs[neighbours])
+        for neighbour, neighbour_dist in zip(neighbours[rewired], neighbour_dists[rewired]):
+            tree.set_parent(neighbour, new_index, new_cost + neighbour_dist)
+
+        if space_map.is_goal(new_state):
+            goal_indices.append(new_index)
+            if first_solution is None:
+                first_solution = (time.time() - start_time, new_cost)
+
+    found = len(goal_indices) > 0
+    stats = planner_stats(iterations, len(tree), collision_checks, time.time() - start_time, found, verbose)
+    stats['first_solution_time'], stats['first_solution_length'] = first_solution or (None, None)
+    if not found:
+        return False, None, None, stats
+    goal_index = goal_indices[np.argmin(tree.costs[goal_indices])]
+    return True, tree.path(goal_index), tree.costs[goal_index], stats
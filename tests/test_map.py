@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+from Manipulator2DMap.obstacle import SphereObstacle
+from Manipulator2DMap.Map import GridMap2D
+from Manipulator2DMap.lattice import LatticeMap
+from Manipulator2DMap.collision_cache import CollisionCache
+from Manipulator2DMap.occupancy import build_occupancy_map
+from AStarDefaults.AStar import AStar
+
+
+@pytest.mark.parametrize('num_joints', [9, 10])
+def test_high_dof_map_without_key_packing(num_joints):
+    manipulator = Manipulator_2d_supervisor(num_joints=num_joints, lengths=[3] * num_joints,
+                                            angle_discretization=180,
+                                            angles_constraints=np.array([PI / 6] * num_joints))
+    start = np.zeros(num_joints)
+    start[0] = PI / 2
+    space_map = GridMap2D(manipulator, start, ((-6, 12), PI), obstacles=[SphereObstacle(np.array([8, 8]), 2)])
+    assert not space_map._lattice.packable
+    assert space_map.get_start() is not None
+    found, goal, steps = AStar(space_map, max_steps=50)[:3]
+    assert steps > 0
+    with pytest.raises(ValueError):
+        LatticeMap(space_map)
+    space_map._collision_cache = CollisionCache()
+    with pytest.raises(ValueError):
+        space_map.check_states_batch(start[np.newaxis])
+
+
+def test_occupancy_map_matches_direct_checks(tmp_path):
+    manipulator = Manipulator_2d_supervisor(num_joints=3, lengths=[8, 5, 5], angle_discretization=72,
+                                            angles_constraints=np.array([PI / 6] * 3))
+    obstacles = [SphereObstacle(np.array([-5, 5]), 2), SphereObstacle(np.array([6, 9]), 2)]
+    space_map = GridMap2D(manipulator, np.array([PI / 2, 0., 0.]), ((-6, 12), PI), obstacles=obstacles)
+    occupancy = build_occupancy_map(space_map, str(tmp_path))
+    lattice = space_map._lattice
+    rng = np.random.default_rng(0)
+    # lattice states with float drift, like states reached by a search
+    states = lattice.bins_to_angles(rng.integers(0, 72, (3000, 3)))
+    for move in rng.integers(0, len(manipulator.possible_moves), (7, 3000)):
+        states = states + manipulator.possible_moves[move]
+    successors = (states[:, np.newaxis] + manipulator.possible_moves).reshape(-1, 3)
+    direct = space_map.check_states_batch(successors)
+    plain = [space_map.get_successors_batch(state)[0] for state in states[:300]]
+    space_map.set_occupancy_map(occupancy)
+    np.testing.assert_array_equal(space_map.check_states_batch(successors), direct)
+    for state, states_without_map in zip(states[:300], plain):
+        np.testing.assert_array_equal(space_map.get_successors_batch(state)[0], states_without_map)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+from Manipulator2DMap.obstacle import SphereObstacle
+from Manipulator2DMap.Map import GridMap2D
+from AStarDefaults.AStar import AStar, make_path
+from AStarDefaults.NodePool import PoolSearchTree
+
+
+def make_map():
+    manipulator = Manipulator_2d_supervisor(num_joints=3, lengths=[8, 5, 5], angle_discretization=72,
+                                            angles_constraints=np.array([PI / 6] * 3))
+    obstacles = [SphereObstacle(np.array([-5, 5]), 2), SphereObstacle(np.array([6, 9]), 2)]
+    return GridMap2D(manipulator, np.array([PI / 2, 0., 0.]), ((-6, 12), PI), obstacles=obstacles)
+
+
+@pytest.mark.parametrize('incremental_fk', [False, True])
+def test_pool_search_tree_matches_search_tree(incremental_fk):
+    space_map = make_map()
+    found, goal = AStar(space_map, incremental_fk=incremental_fk)[:2]
+    found_pool, goal_pool = AStar(space_map, search_tree=PoolSearchTree, incremental_fk=incremental_fk)[:2]
+    assert found and found_pool
+    path, length = make_path(goal)
+    path_pool, length_pool = make_path(goal_pool)
+    assert length_pool == pytest.approx(length)
+    np.testing.assert_allclose(path_pool, path)
+    assert space_map.check_states_batch(np.array(path_pool)).all()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from Manipulator2DMap.Manipulator2D import Manipulator_2d_supervisor, PI
+
+
+def make_manipulator(num_joints, angle_discretization=36):
+    return Manipulator_2d_supervisor(num_joints=num_joints, lengths=[5] * num_joints,
+                                     angle_discretization=angle_discretization,
+                                     angles_constraints=np.zeros(num_joints))
+
+
+@pytest.mark.parametrize('num_joints', [3, 4, 5, 6])
+def test_batch_matches_scalar_on_lattice_states(num_joints):
+    np.random.seed(num_joints)
+    manipulator = make_manipulator(num_joints)
+    # unfiltered lattice states, generate_random_states would keep only correct ones
+    bins = np.random.randint(0, manipulator.angle_discretization, (2000, num_joints))
+    states = bins * manipulator.deltas - PI
+    states[:, 0] += PI / 2
+    dots = manipulator.calculate_dots_batch(states)
+    expected = np.array([manipulator.position_intersection(state_dots) for state_dots in dots])
+    assert not expected.all() and expected.any()
+    np.testing.assert_array_equal(manipulator.position_intersection_batch(dots), expected)
+
+
+# segments 0 and 2 of a 3-joint arm, given by dots
+DEGENERATE_DOTS = [
+    # collinear and overlapping
+    [[0, 0], [4, 0], [4, 2], [2, 0]],
+    # collinear, touching at an end
+    [[0, 0], [4, 0], [6, 3], [4, 0]],
+    # collinear, disjoint
+    [[0, 0], [2, 0], [3, 1], [4, 0]],
+    # end of segment 2 touches the middle of segment 0
+    [[0, 0], [4, 0], [3, 2], [2, 0]],
+    # parallel, not touching
+    [[0, 0], [4, 0], [4, 1], [0, 1]],
+    # proper crossing
+    [[0, 0], [4, 0], [3, 2], [1, -2]],
+    # segment 2 degenerates to a point on segment 0
+    [[0, 0], [4, 0], [2, 2], [2, 0]],
+]
+
+
+@pytest.mark.parametrize('dots', DEGENERATE_DOTS)
+def test_batch_matches_scalar_on_degenerate_segments(dots):
+    manipulator = make_manipulator(3)
+    dots = np.array(dots, dtype=float)
+    assert manipulator.position_intersection_batch(dots[np.newaxis])[0] == manipulator.position_intersection(dots)